@@ -1,153 +1,34 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
-import numpy as np
-import requests
-import datetime
+from alocacao import alocacao_por_upside_parcial, carteira_em_fluxo, empresas_destaque
+from aquecedor import aquecedor, descrever_idade
+from cache_mercado import cache_mercado
+from chamadas import orcamento
+from pipeline import ALVOS_MACROV2, CARTEIRA_PADRAO, parametros_cenario, pipeline
+from rastreamento import finalizar_execucao, iniciar_execucao, tabelas_execucao
 
 st.set_page_config(page_title="Sugestão de Alocação Inteligente", layout="wide")
+execucao = iniciar_execucao("Macrov2")
 st.title("📊 Sugestão de Alocação Baseada em Notícias e Carteira Atual")
 
+# Descarta cotações, retornos e resultados do pipeline em cache para forçar nova busca
+if st.sidebar.button("Atualizar dados de mercado"):
+    cache_mercado.invalidar()
+    pipeline.limpar()
+
 st.markdown("""
 Este app analisa **notícias econômicas atuais** e sua **carteira** para sugerir uma **nova alocação**.
 Além disso, compara os preços atuais dos ativos com os **preços alvo dos analistas** e destaca empresas que performaram bem em **cenários econômicos semelhantes no passado**.
 """)
 
-# Função para obter preço atual e preço alvo do Yahoo Finance
-def get_target_price_yfinance(ticker):
-    try:
-        stock = yf.Ticker(ticker)
-        price = stock.history(period="1d")["Close"][0]
-        target = stock.info.get("targetMeanPrice", None)
-        return price, target
-    except Exception as e:
-        print(f"Erro ao buscar dados de {ticker}: {e}")
-        return None, None
-
-# Análise de desempenho histórico durante anos semelhantes ao cenário atual
-def analise_historica_anos_similares(ticker, anos_semelhantes):
-    try:
-        stock = yf.Ticker(ticker)
-        hoje = datetime.datetime.today().strftime('%Y-%m-%d')
-        hist = stock.history(start="2017-01-01", end=hoje)["Close"]
-        retornos = {}
-        for ano in anos_semelhantes:
-            dados_ano = hist[hist.index.year == ano]
-            if not dados_ano.empty:
-                retorno = dados_ano.pct_change().sum() * 100
-                retornos[ano] = retorno
-        media = np.mean(list(retornos.values())) if retornos else None
-        return media
-    except Exception as e:
-        print(f"Erro ao calcular retorno histórico para {ticker}: {e}")
-        return None
-
-# Busca notícias reais usando GNews API
-def noticias_reais(api_key):
-    url = f"https://gnews.io/api/v4/search?q=economia+brasil&lang=pt&country=br&max=5&token={api_key}"
-    try:
-        response = requests.get(url)
-        data = response.json()
-        noticias = [article["title"] for article in data.get("articles", [])]
-        return noticias
-    except Exception as e:
-        print(f"Erro ao buscar notícias: {e}")
-        return []
-
-# Simulação de análise de cenário com base em notícias reais
-def analisar_cenario_com_noticias(noticias):
-    setores_favoraveis = []
-    setores_alerta = []
-    resumo = ""
-
-    for noticia in noticias:
-        lower = noticia.lower()
-        if "inflação" in lower or "juros altos" in lower:
-            setores_alerta.extend(["bancos", "imobiliário"])
-        if "desemprego em queda" in lower or "consumo" in lower:
-            setores_favoraveis.append("consumo")
-        if "gastos públicos" in lower or "governo" in lower:
-            setores_favoraveis.append("construção")
-        if "importação" in lower or "tarifa" in lower:
-            setores_alerta.append("exportação")
-
-    resumo += "\n".join([f"- {n}" for n in noticias])
-    setores_favoraveis = list(set(setores_favoraveis))
-    setores_alerta = list(set(setores_alerta))
-
-    return resumo, setores_favoraveis, setores_alerta
-
-# Função para gerar o resumo das empresas que se destacam com base no cenário macroeconômico
-def gerar_resumo_empresas_destaque_com_base_nas_noticias(carteira, setores_bull, setores_bear):
-    empresas_destaque = []
-    
-    for i, row in carteira.iterrows():
-        ticker = row['Ticker']
-        price, target = get_target_price_yfinance(ticker)
-        retorno_medio = analise_historica_anos_similares(ticker, anos_similares)
-
-        # Verificar em qual setor a empresa se encaixa e gerar o resumo baseado nas notícias
-        if "consumo" in setores_bull and "consumo" in ticker.lower():
-            empresas_destaque.append({
-                "Ticker": ticker,
-                "Retorno Médio em Anos Similares (%)": retorno_medio,
-                "Motivo": f"Setor de consumo favorecido pelas notícias econômicas atuais. Desempenho histórico positivo."
-            })
-
-        elif "construção" in setores_bull and "construção" in ticker.lower():
-            empresas_destaque.append({
-                "Ticker": ticker,
-                "Retorno Médio em Anos Similares (%)": retorno_medio,
-                "Motivo": f"Setor de construção favorecido pelas notícias econômicas atuais. Desempenho histórico positivo."
-            })
-
-        if retorno_medio is not None and retorno_medio > 15:
-            empresas_destaque.append({
-                "Ticker": ticker,
-                "Retorno Médio em Anos Similares (%)": retorno_medio,
-                "Motivo": f"Desempenho superior ao médio histórico nos anos {', '.join(map(str, anos_similares))}."
-            })
-
-        # Se o setor estiver em alerta e o desempenho histórico for negativo, adicionar ao alerta
-        if "exportação" in setores_bear and "exportação" in ticker.lower():
-            empresas_destaque.append({
-                "Ticker": ticker,
-                "Retorno Médio em Anos Similares (%)": retorno_medio,
-                "Motivo": f"Setor de exportação em alerta devido a notícias econômicas. Desempenho histórico fraco."
-            })
-
-        if price and target:
-            upside = round((target - price) / price * 100, 2)
-            if upside and upside > 15:
-                empresas_destaque.append({
-                    "Ticker": ticker,
-                    "Retorno Médio em Anos Similares (%)": retorno_medio if retorno_medio else "Não disponível",
-                    "Motivo": "Preço alvo sugere um alto potencial de valorização."
-                })
-
-    return empresas_destaque
-
 # Upload da carteira
 st.header("📁 Sua Carteira Atual")
 arquivo = st.file_uploader("Envie um arquivo CSV com colunas: Ticker, Peso (%)", type=["csv"])
 
-carteira_manual = [
-    {"Ticker": "AGRO3.SA", "Peso (%)": 10},
-    {"Ticker": "BBAS3.SA", "Peso (%)": 1.2},
-    {"Ticker": "BBSE3.SA", "Peso (%)": 6.5},
-    {"Ticker": "BPAC11.SA", "Peso (%)": 10.6},
-    {"Ticker": "EGIE3.SA", "Peso (%)": 5},
-    {"Ticker": "ITUB3.SA", "Peso (%)": 0.5},
-    {"Ticker": "PRIO3.SA", "Peso (%)": 15},
-    {"Ticker": "PSSA3.SA", "Peso (%)": 15},
-    {"Ticker": "SAPR3.SA", "Peso (%)": 6.7},
-    {"Ticker": "SBSP3.SA", "Peso (%)": 4},
-    {"Ticker": "VIVT3.SA", "Peso (%)": 6.4},
-    {"Ticker": "WEGE3.SA", "Peso (%)": 15},
-    {"Ticker": "TOTS3.SA", "Peso (%)": 1},
-    {"Ticker": "B3SA3.SA", "Peso (%)": 0.1},
-    {"Ticker": "TAEE3.SA", "Peso (%)": 3},
-]
+# A carteira manual fica no session_state: cada interação com um widget reexecuta o
+# script, e a lista literal perderia os ativos adicionados nas execuções anteriores
+if "carteira_manual" not in st.session_state:
+    st.session_state.carteira_manual = list(CARTEIRA_PADRAO)
 
 st.markdown("### Ou adicione ativos manualmente:")
 ticker_input = st.text_input("Ticker do ativo")
@@ -155,11 +36,11 @@ peso_input = st.number_input("Peso (%)", min_value=0.0, max_value=100.0, step=0.
 
 if st.button("Adicionar ativo manualmente"):
     if ticker_input and peso_input:
-        carteira_manual.append({"Ticker": ticker_input.upper(), "Peso (%)": peso_input})
+        st.session_state.carteira_manual.append({"Ticker": ticker_input.upper(), "Peso (%)": peso_input})
         st.success(f"{ticker_input.upper()} adicionado com sucesso.")
 
 carteira_csv = pd.read_csv(arquivo) if arquivo else pd.DataFrame()
-carteira_manual_df = pd.DataFrame(carteira_manual)
+carteira_manual_df = pd.DataFrame(st.session_state.carteira_manual)
 carteira = pd.concat([carteira_csv, carteira_manual_df], ignore_index=True)
 
 if not carteira.empty:
@@ -172,8 +53,21 @@ if not carteira.empty:
     st.markdown(f"**Anos Semelhantes ao Cenário Atual (Baseado em Inflação e Juros):** {', '.join(map(str, anos_similares))}")
 
     api_key = st.secrets["GNEWS_API_KEY"] if "GNEWS_API_KEY" in st.secrets else "f81e45d8e741c24dfe4971f5403f5a32"
-    noticias = noticias_reais(api_key)
-    resumo, setores_bull, setores_bear = analisar_cenario_com_noticias(noticias)
+    # Pipeline compartilhado: só as etapas cujas entradas mudaram desde a última execução são recalculadas.
+    # Com dados vencidos, exibe o último resultado e atualiza em segundo plano (o aquecedor mantém
+    # os pedidos recentes atualizados antes da abertura e durante o pregão).
+    # Sem nada pronto, só o cenário é calculado antes: a alocação e os destaques são exibidos ticker a ticker abaixo.
+    aquecedor.iniciar(api_key)
+    parametros = parametros_cenario(api_key, "macrov2", carteira, anos_similares)
+    alvos = ALVOS_MACROV2
+    with orcamento():
+        pronto = pipeline.executar_sem_espera(parametros, alvos, calcular=False)
+        if pronto is None:
+            pronto = pipeline.executar(parametros, ["analise_cenario"]), None, False
+    resultados, momento_dados, atualizando = pronto
+    espaco_idade = st.empty()
+    espaco_idade.caption(descrever_idade(momento_dados, atualizando))
+    resumo, setores_bull, setores_bear = resultados["analise_cenario"]
 
     st.markdown("**Notícias Recentes:**")
     st.markdown(resumo)
@@ -182,51 +76,45 @@ if not carteira.empty:
     st.markdown("**Setores com Alerta:** " + ", ".join(setores_bear))
 
     st.header("📌 Sugestão de Alocação")
-    sugestoes = []
-    empresas_destaque_historico = []
-
-    # Cálculo do peso total
-    peso_total = 0
-    for i, row in carteira.iterrows():
-        ticker = row['Ticker']
-        peso = row['Peso (%)']
-        price, target = get_target_price_yfinance(ticker)
-        upside = round((target - price) / price * 100, 2) if price and target else None
-
-        recomendacao = "Manter"
-        peso_sugerido = peso
-        if upside is not None:
-            if upside > 15:
-                recomendacao = "Aumentar"
-                peso_sugerido = min(peso * 1.2, 20)
-            elif upside < 0:
-                recomendacao = "Reduzir"
-                peso_sugerido = max(peso * 0.8, 0)
-
-        peso_total += peso_sugerido
-        sugestoes.append({
-            "Ticker": ticker,
-            "Peso Atual (%)": peso,
-            "Preço Atual": price,
-            "Preço Alvo": target,
-            "Upside (%)": upside,
-            "Recomendação": recomendacao,
-            "Peso Sugerido (%)": round(peso_sugerido, 2)
-        })
-
-    # Normalizar os pesos sugeridos para que o total seja 100%
-    if peso_total > 0:
-        fator_normalizacao = 100 / peso_total
-        for sugestao in sugestoes:
-            sugestao["Peso Sugerido (%)"] = round(sugestao["Peso Sugerido (%)"] * fator_normalizacao, 2)
-
-    df_sugestoes = pd.DataFrame(sugestoes)
-
-    st.write(f"**Total Peso Sugerido:** 100%")
-    st.dataframe(df_sugestoes)
-
-    # Gerar e exibir o resumo das empresas que se destacam com base no cenário macroeconômico
-    empresas_destaque = gerar_resumo_empresas_destaque_com_base_nas_noticias(carteira, setores_bull, setores_bear)
+    espaco_total = st.empty()
+    espaco_sugestoes = st.empty()
+
+    # Exibir o resumo das empresas que se destacam com base no cenário macroeconômico
     st.markdown("### Empresas que se Destacam no Cenário Atual com Base nas Notícias Econômicas:")
-    for empresa in empresas_destaque:
-        st.markdown(f"- **{empresa['Ticker']}**: {empresa['Motivo']}")
+    espaco_destaques = st.empty()
+
+    def mostrar_destaques(destaques):
+        with espaco_destaques.container():
+            for empresa in destaques:
+                st.markdown(f"- **{empresa['Ticker']}**: {empresa['Motivo']}")
+
+    if "sugestoes_upside" not in resultados:
+        # As linhas e os destaques entram à medida que chegam os dados de cada ticker; a normalização
+        # dos pesos só vale com a carteira completa, calculada em seguida pelo pipeline
+        with orcamento():
+            for parcial, cotacoes, retornos, indice in carteira_em_fluxo(carteira, anos_similares):
+                espaco_total.caption(
+                    f"Carregando ativos ({len(parcial)}/{len(carteira)}); pesos ainda sem normalização."
+                )
+                espaco_sugestoes.dataframe(alocacao_por_upside_parcial(parcial, cotacoes))
+                mostrar_destaques(empresas_destaque(
+                    parcial, setores_bull, setores_bear, anos_similares, cotacoes=cotacoes, retornos=retornos,
+                    indice=indice,
+                ))
+            resultados, momento_dados, atualizando = pipeline.executar_sem_espera(parametros, alvos)
+        espaco_idade.caption(descrever_idade(momento_dados, atualizando))
+
+    espaco_total.write(f"**Total Peso Sugerido:** 100%")
+    espaco_sugestoes.dataframe(resultados["sugestoes_upside"])
+    mostrar_destaques(resultados["destaques"])
+
+# Painel opcional com as medições desta execução (também exportadas em JSON lines);
+# as tabelas só são montadas quando o painel é pedido
+finalizar_execucao(execucao)
+if st.sidebar.checkbox("Mostrar desempenho desta execução"):
+    with st.sidebar.expander("Desempenho desta execução", expanded=True):
+        etapas, externas, caches = tabelas_execucao(execucao)
+        st.markdown(f"**Tempo total:** {execucao.segundos:.2f}s")
+        st.dataframe(etapas)
+        st.dataframe(externas)
+        st.dataframe(caches)
@@ -1,150 +1,35 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
-import numpy as np
-import requests
-import datetime
+from alocacao import LIMITE_UPSIDE, alocacao_parcial, carteira_em_fluxo, empresas_em_oportunidade
+from aquecedor import aquecedor, descrever_idade
+from cache_mercado import cache_mercado
+from chamadas import orcamento
+from otimizacao import METODOS
+from pipeline import ALVOS_MACROV3, CARTEIRA_PADRAO, parametros_cenario, pipeline
+from rastreamento import finalizar_execucao, iniciar_execucao, tabelas_execucao
+from universo import consultar_universo, info_snapshot
 
 st.set_page_config(page_title="Sugestão de Alocação Inteligente", layout="wide")
+execucao = iniciar_execucao("Macrov3")
 st.title("📊 Sugestão de Alocação Baseada em Notícias e Carteira Atual")
 
-# Função para obter preço atual e preço alvo do Yahoo Finance
-def get_target_price_yfinance(ticker):
-    try:
-        stock = yf.Ticker(ticker)
-        price = stock.history(period="1d")["Close"][0]
-        target = stock.info.get("targetMeanPrice", None)
-        return price, target
-    except Exception as e:
-        print(f"Erro ao buscar dados de {ticker}: {e}")
-        return None, None
-
-# Análise de desempenho histórico durante anos semelhantes ao cenário atual
-def analise_historica_anos_similares(ticker, anos_simelhantes):
-    try:
-        stock = yf.Ticker(ticker)
-        hoje = datetime.datetime.today().strftime('%Y-%m-%d')
-        hist = stock.history(start="2017-01-01", end=hoje)["Close"]
-        retornos = {}
-        for ano in anos_simelhantes:
-            dados_ano = hist[hist.index.year == ano]
-            if not dados_ano.empty:
-                retorno = dados_ano.pct_change().sum() * 100
-                retornos[ano] = retorno
-        media = np.mean(list(retornos.values())) if retornos else None
-        return media
-    except Exception as e:
-        print(f"Erro ao calcular retorno histórico para {ticker}: {e}")
-        return None
-
-# Função para buscar notícias reais com a API do GNews
-def noticias_reais(api_key):
-    url = f"https://gnews.io/api/v4/search?q=economia+brasil&lang=pt&country=br&max=5&token={api_key}"
-    try:
-        response = requests.get(url)
-        data = response.json()
-        noticias = [article["title"] for article in data.get("articles", [])]
-        return noticias
-    except Exception as e:
-        print(f"Erro ao buscar notícias: {e}")
-        return []
-
-# Função para analisar o cenário com base nas notícias
-def analisar_cenario_com_noticias(noticias):
-    setores_favoraveis = []
-    setores_alerta = []
-    resumo = ""
-
-    for noticia in noticias:
-        lower = noticia.lower()
-
-        if "inflação" in lower or "juros altos" in lower:
-            setores_alerta.extend(["bancos", "imobiliário"])
-        
-        if "crescimento econômico" in lower or "expansão" in lower:
-            setores_favoraveis.append("energia renovável")
-            setores_favoraveis.append("tecnologia")
-        
-        if "gastos públicos" in lower or "governo" in lower:
-            setores_favoraveis.append("construção")
-
-        if "exportação" in lower or "tarifa" in lower:
-            setores_alerta.append("importação")
-            setores_favoraveis.append("exportação")
-
-    resumo += "\n".join([f"- {n}" for n in noticias])
-    setores_favoraveis = list(set(setores_favoraveis))
-    setores_alerta = list(set(setores_alerta))
-
-    return resumo, setores_favoraveis, setores_alerta
-
-# Ajustar a alocação com base no cenário macroeconômico
-def ajustar_alocacao(carteira, setores_bull, setores_bear):
-    sugestoes = []
-    peso_total = 0
-
-    for i, row in carteira.iterrows():
-        ticker = row['Ticker']
-        peso = row['Peso (%)']
-        price, target = get_target_price_yfinance(ticker)
-        retorno_medio = analise_historica_anos_similares(ticker, anos_simelhantes)
-
-        recomendacao = "Manter"
-        peso_sugerido = peso
-
-        # Ajuste baseado nos setores
-        if any(setor in ticker.lower() for setor in setores_bull):
-            recomendacao = "Aumentar"
-            peso_sugerido = min(peso * 1.2, 20)
-        
-        elif any(setor in ticker.lower() for setor in setores_bear):
-            recomendacao = "Reduzir"
-            peso_sugerido = max(peso * 0.8, 0)
-
-        if retorno_medio is not None and retorno_medio > 15:
-            recomendacao = "Aumentar"
-            peso_sugerido = min(peso * 1.2, 20)
-
-        peso_total += peso_sugerido
-
-        sugestoes.append({
-            "Ticker": ticker,
-            "Peso Atual (%)": peso,
-            "Preço Atual": price,
-            "Preço Alvo": target,
-            "Recomendação": recomendacao,
-            "Peso Sugerido (%)": round(peso_sugerido, 2)
-        })
-
-    # Normalizar os pesos sugeridos para 100%
-    if peso_total > 0:
-        fator_normalizacao = 100 / peso_total
-        for sugestao in sugestoes:
-            sugestao["Peso Sugerido (%)"] = round(sugestao["Peso Sugerido (%)"] * fator_normalizacao, 2)
-
-    return pd.DataFrame(sugestoes)
+# Descarta cotações, retornos e resultados do pipeline em cache para forçar nova busca
+if st.sidebar.button("Atualizar dados de mercado"):
+    cache_mercado.invalidar()
+    pipeline.limpar()
+
+# Método de alocação: regras de aumento/redução ou um otimizador baseado na covariância
+OPCOES_METODO = {None: "Regras (heurística)", **METODOS}
+metodo = st.sidebar.selectbox("Método de alocação", list(OPCOES_METODO), format_func=OPCOES_METODO.get)
 
 # Upload da carteira
 st.header("📁 Sua Carteira Atual")
 arquivo = st.file_uploader("Envie um arquivo CSV com colunas: Ticker, Peso (%)", type=["csv"])
 
-carteira_manual = [
-    {"Ticker": "AGRO3.SA", "Peso (%)": 10},
-    {"Ticker": "BBAS3.SA", "Peso (%)": 1.2},
-    {"Ticker": "BBSE3.SA", "Peso (%)": 6.5},
-    {"Ticker": "BPAC11.SA", "Peso (%)": 10.6},
-    {"Ticker": "EGIE3.SA", "Peso (%)": 5},
-    {"Ticker": "ITUB3.SA", "Peso (%)": 0.5},
-    {"Ticker": "PRIO3.SA", "Peso (%)": 15},
-    {"Ticker": "PSSA3.SA", "Peso (%)": 15},
-    {"Ticker": "SAPR3.SA", "Peso (%)": 6.7},
-    {"Ticker": "SBSP3.SA", "Peso (%)": 4},
-    {"Ticker": "VIVT3.SA", "Peso (%)": 6.4},
-    {"Ticker": "WEGE3.SA", "Peso (%)": 15},
-    {"Ticker": "TOTS3.SA", "Peso (%)": 1},
-    {"Ticker": "B3SA3.SA", "Peso (%)": 0.1},
-    {"Ticker": "TAEE3.SA", "Peso (%)": 3},
-]
+# A carteira manual fica no session_state: cada interação com um widget reexecuta o
+# script, e a lista literal perderia os ativos adicionados nas execuções anteriores
+if "carteira_manual" not in st.session_state:
+    st.session_state.carteira_manual = list(CARTEIRA_PADRAO)
 
 st.markdown("### Ou adicione ativos manualmente:")
 ticker_input = st.text_input("Ticker do ativo")
@@ -152,11 +37,11 @@ peso_input = st.number_input("Peso (%)", min_value=0.0, max_value=100.0, step=0.
 
 if st.button("Adicionar ativo manualmente"):
     if ticker_input and peso_input:
-        carteira_manual.append({"Ticker": ticker_input.upper(), "Peso (%)": peso_input})
+        st.session_state.carteira_manual.append({"Ticker": ticker_input.upper(), "Peso (%)": peso_input})
         st.success(f"{ticker_input.upper()} adicionado com sucesso.")
 
 carteira_csv = pd.read_csv(arquivo) if arquivo else pd.DataFrame()
-carteira_manual_df = pd.DataFrame(carteira_manual)
+carteira_manual_df = pd.DataFrame(st.session_state.carteira_manual)
 carteira = pd.concat([carteira_csv, carteira_manual_df], ignore_index=True)
 
 if not carteira.empty:
@@ -169,8 +54,21 @@ if not carteira.empty:
     st.markdown(f"**Anos Semelhantes ao Cenário Atual (Baseado em Inflação e Juros):** {', '.join(map(str, anos_similares))}")
 
     api_key = st.secrets["GNEWS_API_KEY"] if "GNEWS_API_KEY" in st.secrets else "f81e45d8e741c24dfe4971f5403f5a32"
-    noticias = noticias_reais(api_key)
-    resumo, setores_bull, setores_bear = analisar_cenario_com_noticias(noticias)
+    # Pipeline compartilhado: só as etapas cujas entradas mudaram desde a última execução são recalculadas.
+    # Com dados vencidos, exibe o último resultado e atualiza em segundo plano (o aquecedor mantém
+    # os pedidos recentes atualizados antes da abertura e durante o pregão).
+    # Sem nada pronto, só o cenário é calculado antes: a alocação é exibida ticker a ticker abaixo.
+    aquecedor.iniciar(api_key)
+    parametros = parametros_cenario(api_key, "macrov3", carteira, anos_similares, metodo=metodo)
+    alvos = ALVOS_MACROV3
+    with orcamento():
+        pronto = pipeline.executar_sem_espera(parametros, alvos, calcular=False)
+        if pronto is None:
+            pronto = pipeline.executar(parametros, ["analise_cenario"]), None, False
+    resultados, momento_dados, atualizando = pronto
+    espaco_idade = st.empty()
+    espaco_idade.caption(descrever_idade(momento_dados, atualizando))
+    resumo, setores_bull, setores_bear = resultados["analise_cenario"]
 
     st.markdown("**Notícias Recentes:**")
     st.markdown(resumo)
@@ -192,37 +90,68 @@ if not carteira.empty:
     st.markdown(resumo_setores_favoraveis)
 
     st.header("📌 Sugestão de Alocação")
-    
-    df_sugestoes = ajustar_alocacao(carteira, setores_bull, setores_bear)
-
-    st.write(f"**Total Peso Sugerido:** 100%")
-    st.dataframe(df_sugestoes)
+    espaco_total = st.empty()
+    espaco_sugestoes = st.empty()
+    espaco_oportunidades = st.empty()
 
     # Resumo das empresas em oportunidade
-    empresas_oportunidade = []
-    motivos_oportunidade = []
-
-    for i, row in df_sugestoes.iterrows():
-        if row["Recomendação"] == "Aumentar" and row["Peso Sugerido (%)"] > 5:  # Filtra as empresas com recomendação para aumentar e com peso sugerido relevante
-            empresas_oportunidade.append({
-                "Ticker": row["Ticker"],
-                "Preço Atual": row["Preço Atual"],
-                "Preço Alvo": row["Preço Alvo"],
-                "Peso Sugerido (%)": row["Peso Sugerido (%)"]
-            })
-            # Motivos para as empresas estarem em oportunidade
-            motivo = f"{row['Ticker']} está em oportunidade devido a seu setor ser favorecido e seu bom desempenho histórico em cenários semelhantes ao atual."
-            if row["Preço Alvo"] and row["Preço Alvo"] > row["Preço Atual"]:
-                motivo += " Além disso, o preço alvo está acima do preço atual, sugerindo potencial de valorização."
-            motivos_oportunidade.append(motivo)
-    
-    if empresas_oportunidade:
-        st.header("📈 Empresas em Oportunidade")
-        df_oportunidade = pd.DataFrame(empresas_oportunidade)
-        st.dataframe(df_oportunidade)
-
-        st.header("📝 Motivo das Oportunidades")
-        for motivo in motivos_oportunidade:
-            st.markdown(f"- {motivo}")
+    def mostrar_oportunidades(df_oportunidade, motivos_oportunidade):
+        with espaco_oportunidades.container():
+            if not df_oportunidade.empty:
+                st.header("📈 Empresas em Oportunidade")
+                st.dataframe(df_oportunidade)
+
+                st.header("📝 Motivo das Oportunidades")
+                for motivo in motivos_oportunidade:
+                    st.markdown(f"- {motivo}")
+            else:
+                st.markdown("Não há empresas em oportunidade com base nos critérios de recomendação.")
+
+    if "sugestoes" not in resultados:
+        # As linhas entram à medida que chegam os dados de cada ticker; a normalização dos pesos
+        # (e o otimizador) só vale com a carteira completa, calculada em seguida pelo pipeline
+        with orcamento():
+            for parcial, cotacoes, retornos, indice in carteira_em_fluxo(carteira, anos_similares):
+                df_parcial = alocacao_parcial(
+                    parcial, setores_bull, setores_bear, anos_similares, metodo, cotacoes, retornos, indice,
+                )
+                espaco_total.caption(
+                    f"Carregando ativos ({len(parcial)}/{len(carteira)}); pesos ainda sem normalização."
+                )
+                espaco_sugestoes.dataframe(df_parcial)
+                mostrar_oportunidades(*empresas_em_oportunidade(df_parcial))
+            resultados, momento_dados, atualizando = pipeline.executar_sem_espera(parametros, alvos)
+        espaco_idade.caption(descrever_idade(momento_dados, atualizando))
+
+    espaco_total.write(f"**Total Peso Sugerido:** 100%")
+    espaco_sugestoes.dataframe(resultados["sugestoes"])
+    mostrar_oportunidades(*resultados["oportunidades"])
+
+    # Triagem do universo B3 a partir do snapshot noturno (python universo.py), sem acessar a rede
+    st.header("🔎 Oportunidades no Universo B3")
+    info_universo = info_snapshot()
+    if info_universo is None:
+        st.markdown("Snapshot do universo ainda não gerado (execute `python universo.py`).")
     else:
-        st.markdown("Não há empresas em oportunidade com base nos critérios de recomendação.")
+        data_universo, anos_universo = info_universo
+        st.markdown(
+            f"Upside acima de {LIMITE_UPSIDE}% em setores favorecidos, entre as ações líquidas da lista de "
+            f"universo (não todos os papéis da B3; snapshot de {data_universo}, "
+            f"anos similares: {', '.join(map(str, anos_universo))})."
+        )
+        df_universo = consultar_universo(LIMITE_UPSIDE, setores_bull)
+        if not df_universo.empty:
+            st.dataframe(df_universo)
+        else:
+            st.markdown("Nenhum ativo do universo atende aos critérios.")
+
+# Painel opcional com as medições desta execução (também exportadas em JSON lines);
+# as tabelas só são montadas quando o painel é pedido
+finalizar_execucao(execucao)
+if st.sidebar.checkbox("Mostrar desempenho desta execução"):
+    with st.sidebar.expander("Desempenho desta execução", expanded=True):
+        etapas, externas, caches = tabelas_execucao(execucao)
+        st.markdown(f"**Tempo total:** {execucao.segundos:.2f}s")
+        st.dataframe(etapas)
+        st.dataframe(externas)
+        st.dataframe(caches)
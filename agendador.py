@@ -0,0 +1,83 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Limites por provedor: chamadas simultâneas, taxa (chamadas/s) e rajada máxima
+PROVEDORES = {
+    "yahoo": {"concorrencia": 8, "taxa": 10.0, "rajada": 10},
+    "gnews": {"concorrencia": 1, "taxa": 1.0, "rajada": 1},
+    "bcb": {"concorrencia": 4, "taxa": 5.0, "rajada": 5},
+}
+LIMITE_PADRAO = {"concorrencia": 4, "taxa": 5.0, "rajada": 5}
+MAX_WORKERS = 16
+
+
+# Balde de tokens: libera no máximo `taxa` chamadas por segundo, com rajadas de até `capacidade`
+class BaldeTokens:
+    def __init__(self, taxa, capacidade):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self._tokens = float(capacidade)
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+                self._ultimo = agora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.taxa
+            time.sleep(espera)
+
+
+# Agendador de buscas externas: um pool de threads compartilhado, com limite de
+# concorrência e de taxa por provedor. As funções agendadas devem ser chamadas
+# "folha" (que não agendam outras buscas), para não ocupar o pool esperando por ele.
+class AgendadorBuscas:
+    def __init__(self, max_workers=MAX_WORKERS, provedores=None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="busca")
+        self._limites = dict(PROVEDORES if provedores is None else provedores)
+        self._semaforos = {}
+        self._baldes = {}
+        self._lock = threading.Lock()
+
+    # Altera os limites de um provedor (vale para as próximas chamadas)
+    def configurar(self, provedor, concorrencia, taxa, rajada):
+        with self._lock:
+            self._limites[provedor] = {"concorrencia": concorrencia, "taxa": taxa, "rajada": rajada}
+            self._semaforos.pop(provedor, None)
+            self._baldes.pop(provedor, None)
+
+    def _controles(self, provedor):
+        with self._lock:
+            if provedor not in self._semaforos:
+                limite = self._limites.get(provedor, LIMITE_PADRAO)
+                self._semaforos[provedor] = threading.BoundedSemaphore(limite["concorrencia"])
+                self._baldes[provedor] = BaldeTokens(limite["taxa"], limite["rajada"])
+            return self._semaforos[provedor], self._baldes[provedor]
+
+    def _chamar(self, provedor, funcao, args, kwargs):
+        semaforo, balde = self._controles(provedor)
+        with semaforo:
+            balde.adquirir()
+            return funcao(*args, **kwargs)
+
+    # Agenda uma chamada e devolve um Future. A chamada roda no contexto de quem a agendou,
+    # para que as medições da execução em andamento (rastreamento.py) sigam para a thread.
+    def executar(self, provedor, funcao, *args, **kwargs):
+        contexto = contextvars.copy_context()
+        return self._pool.submit(contexto.run, self._chamar, provedor, funcao, args, kwargs)
+
+    # Executa a função para cada item e devolve os resultados na mesma ordem dos itens
+    def mapear(self, provedor, funcao, itens):
+        futuros = [self.executar(provedor, funcao, item) for item in itens]
+        return [futuro.result() for futuro in futuros]
+
+
+# Instância única por processo, compartilhada por todas as sessões do Streamlit
+agendador = AgendadorBuscas()
@@ -0,0 +1,290 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from dados_mercado import (
+    COLUNAS_COTACAO, analise_historica_carteira, dados_em_fluxo, obter_cotacoes_carteira, preco_e_alvo, retorno_de,
+)
+from otimizacao import covariancia_carteira, otimizar_pesos
+from rastreamento import etapa
+from setores import indice_setores, marcar_setores, setores_da_carteira
+
+FATOR_AUMENTO = 1.2
+FATOR_REDUCAO = 0.8
+PESO_MAXIMO = 20
+LIMITE_UPSIDE = 15
+LIMITE_RETORNO_HISTORICO = 15
+PESO_OPORTUNIDADE = 5
+# Diferença (pontos percentuais) abaixo da qual o peso otimizado é tratado como "Manter"
+TOLERANCIA_MANTER = 0.5
+# Intervalo mínimo (s) entre as entregas parciais da carteira em fluxo
+INTERVALO_FLUXO = 0.2
+
+
+# Função para calcular recomendação e peso sugerido de todos os ativos de uma vez.
+# Recebe arrays alinhados (1-D, ou datas × ativos): pesos atuais e as máscaras de aumentar/reduzir
+# (aumentar tem prioridade sobre reduzir). Os pesos sugeridos são normalizados para 100%
+# (com `normalizar=False`, ficam só ajustados, para exibir parte da carteira).
+def calcular_pesos_sugeridos(pesos, aumentar, reduzir, normalizar=True):
+    pesos = np.asarray(pesos, dtype=float)
+    aumentar = np.asarray(aumentar, dtype=bool)
+    reduzir = np.asarray(reduzir, dtype=bool) & ~aumentar
+
+    peso_sugerido = np.where(
+        aumentar,
+        np.minimum(pesos * FATOR_AUMENTO, PESO_MAXIMO),
+        np.where(reduzir, np.maximum(pesos * FATOR_REDUCAO, 0), pesos),
+    )
+    recomendacao = np.where(aumentar, "Aumentar", np.where(reduzir, "Reduzir", "Manter"))
+    if not normalizar:
+        return recomendacao, np.round(peso_sugerido, 2)
+
+    # Normalização ao longo do último eixo: uma carteira (1-D) ou uma carteira por data (2-D)
+    peso_total = peso_sugerido.sum(axis=-1, keepdims=True)
+    peso_sugerido = np.round(peso_sugerido, 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalizado = np.round(peso_sugerido * (100 / peso_total), 2)
+    return recomendacao, np.where(peso_total > 0, normalizado, peso_sugerido)
+
+
+# Função para calcular o upside (%) em relação ao preço alvo; NaN quando não há preço ou alvo
+def calcular_upside(precos, alvos):
+    precos = np.asarray(precos, dtype=float)
+    alvos = np.asarray(alvos, dtype=float)
+    validos = np.isfinite(precos) & np.isfinite(alvos) & (precos != 0) & (alvos != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        upside = np.round((alvos - precos) / precos * 100, 2)
+    return np.where(validos, upside, np.nan)
+
+
+# Função para calcular os sinais do cenário por posição: aumentar (setor favorecido ou bom
+# retorno em anos similares) e reduzir (setor em alerta e não favorecido)
+def sinais_cenario(tickers, setores_bull, setores_bear, anos_similares, retornos=None, indice=None):
+    if retornos is None:
+        retornos = analise_historica_carteira(tickers, anos_similares)
+    retorno_medio = retornos.reindex(tickers).to_numpy(dtype=float)
+
+    tabela_setores = setores_da_carteira(tickers, indice)
+    bull = marcar_setores(tickers, setores_bull, tabela_setores)
+    bear = marcar_setores(tickers, setores_bear, tabela_setores)
+    return bull | (retorno_medio > LIMITE_RETORNO_HISTORICO), ~bull & bear
+
+
+# Ajustar a alocação com base no cenário macroeconômico
+@etapa
+def ajustar_alocacao(carteira, setores_bull, setores_bear, anos_similares, cotacoes=None, retornos=None, indice=None):
+    if cotacoes is None:
+        cotacoes = obter_cotacoes_carteira(carteira['Ticker'].astype(str).tolist())
+    return _alocacao_por_regras(carteira, setores_bull, setores_bear, anos_similares, cotacoes, retornos, indice)
+
+
+def _alocacao_por_regras(carteira, setores_bull, setores_bear, anos_similares, cotacoes, retornos, indice,
+                         normalizar=True):
+    tickers = carteira['Ticker'].astype(str).tolist()
+    pesos = carteira['Peso (%)'].to_numpy(dtype=float)
+    cotacoes = cotacoes.reindex(tickers)
+
+    aumentar, reduzir = sinais_cenario(tickers, setores_bull, setores_bear, anos_similares, retornos, indice)
+    recomendacao, peso_sugerido = calcular_pesos_sugeridos(pesos, aumentar, reduzir, normalizar)
+
+    return pd.DataFrame({
+        "Ticker": tickers,
+        "Peso Atual (%)": carteira['Peso (%)'].to_numpy(),
+        "Preço Atual": cotacoes["Preço Atual"].to_numpy(),
+        "Preço Alvo": cotacoes["Preço Alvo"].to_numpy(),
+        "Recomendação": recomendacao,
+        "Peso Sugerido (%)": peso_sugerido,
+    })
+
+
+# Ajustar a alocação com um otimizador baseado na covariância (alternativa aos fatores fixos).
+# Os sinais do cenário entram como visões na média-variância. Ativos sem histórico suficiente
+# para a covariância mantêm o peso atual; o restante é distribuído pelo otimizador.
+@etapa
+def ajustar_alocacao_otimizada(carteira, setores_bull, setores_bear, anos_similares, metodo,
+                               cotacoes=None, retornos=None, indice=None, covariancia=None):
+    tickers = carteira['Ticker'].astype(str).tolist()
+    pesos = carteira['Peso (%)'].to_numpy(dtype=float)
+    if cotacoes is None:
+        cotacoes = obter_cotacoes_carteira(tickers)
+    if covariancia is None:
+        covariancia = covariancia_carteira(tickers)
+    cotacoes = cotacoes.reindex(tickers)
+
+    aumentar, reduzir = sinais_cenario(tickers, setores_bull, setores_bear, anos_similares, retornos, indice)
+    visoes = pd.Series(aumentar.astype(float) - (reduzir & ~aumentar), index=tickers)
+    visoes = visoes[~visoes.index.duplicated()]
+    otimizados = otimizar_pesos(covariancia, metodo, visoes, PESO_MAXIMO / 100)
+
+    peso_total = pesos.sum()
+    peso_atual = pesos * (100 / peso_total) if peso_total > 0 else pesos
+    # Posições repetidas do mesmo ticker dividem o peso otimizado
+    repeticoes = pd.Series(tickers).map(pd.Series(tickers).value_counts()).to_numpy()
+    otimizado = pd.Series(tickers).map(otimizados).to_numpy(dtype=float) / repeticoes
+    fixos = np.isnan(otimizado)
+    peso_sugerido = np.round(np.where(fixos, peso_atual, otimizado * (100 - peso_atual[fixos].sum())), 2)
+
+    diferenca = peso_sugerido - peso_atual
+    recomendacao = np.where(
+        diferenca > TOLERANCIA_MANTER, "Aumentar", np.where(diferenca < -TOLERANCIA_MANTER, "Reduzir", "Manter")
+    )
+    return pd.DataFrame({
+        "Ticker": tickers,
+        "Peso Atual (%)": carteira['Peso (%)'].to_numpy(),
+        "Preço Atual": cotacoes["Preço Atual"].to_numpy(),
+        "Preço Alvo": cotacoes["Preço Alvo"].to_numpy(),
+        "Recomendação": recomendacao,
+        "Peso Sugerido (%)": peso_sugerido,
+    })
+
+
+# Ajustar a alocação com base no upside em relação ao preço alvo dos analistas
+@etapa
+def ajustar_alocacao_por_upside(carteira, cotacoes=None):
+    if cotacoes is None:
+        cotacoes = obter_cotacoes_carteira(carteira['Ticker'].astype(str).tolist())
+    return _alocacao_por_upside(carteira, cotacoes)
+
+
+def _alocacao_por_upside(carteira, cotacoes, normalizar=True):
+    tickers = carteira['Ticker'].astype(str).tolist()
+    pesos = carteira['Peso (%)'].to_numpy(dtype=float)
+    cotacoes = cotacoes.reindex(tickers)
+    upside = calcular_upside(cotacoes["Preço Atual"], cotacoes["Preço Alvo"])
+
+    recomendacao, peso_sugerido = calcular_pesos_sugeridos(pesos, upside > LIMITE_UPSIDE, upside < 0, normalizar)
+
+    return pd.DataFrame({
+        "Ticker": tickers,
+        "Peso Atual (%)": carteira['Peso (%)'].to_numpy(),
+        "Preço Atual": cotacoes["Preço Atual"].to_numpy(),
+        "Preço Alvo": cotacoes["Preço Alvo"].to_numpy(),
+        "Upside (%)": upside,
+        "Recomendação": recomendacao,
+        "Peso Sugerido (%)": peso_sugerido,
+    })
+
+
+# Função para acompanhar a chegada dos dados de mercado da carteira. Os dados de cada ticker
+# entram em cotações e retornos já alocados para a carteira inteira (atualizados no lugar), e a
+# cada `intervalo` segundos (e ao final) gera as posições que já têm dados, na ordem da
+# carteira, com os dados acumulados até ali.
+def carteira_em_fluxo(carteira, anos_similares, intervalo=INTERVALO_FLUXO):
+    tickers = carteira['Ticker'].astype(str)
+    unicos = list(dict.fromkeys(tickers))
+    posicoes = tickers.reset_index(drop=True).groupby(tickers.to_numpy()).indices
+    cotacoes = pd.DataFrame(index=pd.Index(unicos, name="Ticker"), columns=COLUNAS_COTACAO, dtype=float)
+    retornos = pd.Series(np.nan, index=unicos, dtype=float)
+    indice = {}
+    chegaram = np.zeros(len(tickers), dtype=bool)
+    recebidos = 0
+    ultima_entrega = None
+
+    for ticker, cotacao, retorno, setores in dados_em_fluxo(unicos, anos_similares):
+        cotacoes.loc[ticker] = cotacao.loc[ticker]
+        retornos[ticker] = retorno.get(ticker)
+        indice.update(setores)
+        chegaram[posicoes[ticker]] = True
+        recebidos += 1
+        if ultima_entrega is None or recebidos == len(unicos) or time.monotonic() - ultima_entrega >= intervalo:
+            ultima_entrega = time.monotonic()
+            yield carteira[chegaram], cotacoes, retornos, indice
+
+
+# Função para montar a sugestão de alocação parcial (só as posições que já têm dados), com os
+# pesos ajustados ainda sem normalizar. O otimizador depende da carteira inteira: até lá,
+# a tabela mostra apenas as cotações.
+def alocacao_parcial(carteira, setores_bull, setores_bear, anos_similares, metodo, cotacoes, retornos, indice):
+    if metodo is None:
+        return _alocacao_por_regras(
+            carteira, setores_bull, setores_bear, anos_similares, cotacoes, retornos, indice, normalizar=False,
+        )
+    tickers = carteira['Ticker'].astype(str).tolist()
+    cotacoes = cotacoes.reindex(tickers)
+    return pd.DataFrame({
+        "Ticker": tickers,
+        "Peso Atual (%)": carteira['Peso (%)'].to_numpy(),
+        "Preço Atual": cotacoes["Preço Atual"].to_numpy(),
+        "Preço Alvo": cotacoes["Preço Alvo"].to_numpy(),
+        "Recomendação": None,
+        "Peso Sugerido (%)": np.nan,
+    })
+
+
+# Função para montar a sugestão por upside parcial, com os pesos ajustados ainda sem normalizar
+def alocacao_por_upside_parcial(carteira, cotacoes):
+    return _alocacao_por_upside(carteira, cotacoes, normalizar=False)
+
+
+# Função para listar as empresas que se destacam no cenário (setor favorecido ou em alerta,
+# desempenho em anos similares e potencial de valorização pelo preço alvo)
+def empresas_destaque(carteira, setores_bull, setores_bear, anos_similares, cotacoes=None, retornos=None, indice=None):
+    tickers = carteira['Ticker'].astype(str).tolist()
+    cotacoes = obter_cotacoes_carteira(tickers) if cotacoes is None else cotacoes
+    retornos = analise_historica_carteira(tickers, anos_similares) if retornos is None else retornos
+    indice = indice_setores(tickers) if indice is None else indice
+    destaques = []
+
+    for ticker in tickers:
+        price, target = preco_e_alvo(cotacoes, ticker)
+        retorno_medio = retorno_de(retornos, ticker)
+        setores_ticker = indice.get(ticker, ())
+
+        # Verificar em qual setor a empresa se encaixa e gerar o resumo baseado nas notícias
+        if "consumo" in setores_bull and "consumo" in setores_ticker:
+            destaques.append({
+                "Ticker": ticker,
+                "Retorno Médio em Anos Similares (%)": retorno_medio,
+                "Motivo": "Setor de consumo favorecido pelas notícias econômicas atuais. Desempenho histórico positivo."
+            })
+
+        elif "construção" in setores_bull and "construção" in setores_ticker:
+            destaques.append({
+                "Ticker": ticker,
+                "Retorno Médio em Anos Similares (%)": retorno_medio,
+                "Motivo": "Setor de construção favorecido pelas notícias econômicas atuais. Desempenho histórico positivo."
+            })
+
+        if retorno_medio is not None and retorno_medio > LIMITE_RETORNO_HISTORICO:
+            destaques.append({
+                "Ticker": ticker,
+                "Retorno Médio em Anos Similares (%)": retorno_medio,
+                "Motivo": f"Desempenho superior ao médio histórico nos anos {', '.join(map(str, anos_similares))}."
+            })
+
+        # Se o setor estiver em alerta e o desempenho histórico for negativo, adicionar ao alerta
+        if "exportação" in setores_bear and "exportação" in setores_ticker:
+            destaques.append({
+                "Ticker": ticker,
+                "Retorno Médio em Anos Similares (%)": retorno_medio,
+                "Motivo": "Setor de exportação em alerta devido a notícias econômicas. Desempenho histórico fraco."
+            })
+
+        if price and target:
+            upside = round((target - price) / price * 100, 2)
+            if upside and upside > LIMITE_UPSIDE:
+                destaques.append({
+                    "Ticker": ticker,
+                    "Retorno Médio em Anos Similares (%)": retorno_medio if retorno_medio else "Não disponível",
+                    "Motivo": "Preço alvo sugere um alto potencial de valorização."
+                })
+
+    return destaques
+
+
+# Função para selecionar as empresas em oportunidade (recomendação de aumentar com peso
+# sugerido relevante) e os motivos de cada uma
+def empresas_em_oportunidade(sugestoes):
+    selecionadas = sugestoes[
+        (sugestoes["Recomendação"] == "Aumentar") & (sugestoes["Peso Sugerido (%)"] > PESO_OPORTUNIDADE)
+    ]
+    oportunidades = selecionadas[["Ticker", "Preço Atual", "Preço Alvo", "Peso Sugerido (%)"]].reset_index(drop=True)
+
+    motivos = []
+    for ticker, preco, alvo in zip(selecionadas["Ticker"], selecionadas["Preço Atual"], selecionadas["Preço Alvo"]):
+        motivo = f"{ticker} está em oportunidade devido a seu setor ser favorecido e seu bom desempenho histórico em cenários semelhantes ao atual."
+        if alvo > preco:
+            motivo += " Além disso, o preço alvo está acima do preço atual, sugerindo potencial de valorização."
+        motivos.append(motivo)
+    return oportunidades, motivos
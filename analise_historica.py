@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+COLUNA_MEDIA = "Média"
+
+
+# Função para calcular, de uma vez, o retorno composto (%) de cada ticker em cada ano.
+# Recebe um painel de fechamentos (datas × tickers) e devolve uma matriz tickers × anos,
+# com a média dos anos na coluna "Média".
+def retornos_anos_similares(painel, anos):
+    anos = [int(ano) for ano in anos]
+    colunas = anos + [COLUNA_MEDIA]
+    if painel.empty or not anos:
+        return pd.DataFrame(np.nan, index=painel.columns, columns=colunas)
+
+    painel = painel.loc[painel.index.year.isin(anos)]
+    grupos = painel.groupby(painel.index.year)
+    # first/last ignoram NaN por coluna, então cada ticker usa seu primeiro e último pregão do ano
+    retornos = (grupos.last() / grupos.first() - 1) * 100
+
+    matriz = retornos.T.reindex(index=painel.columns, columns=anos)
+    matriz[COLUNA_MEDIA] = matriz[anos].mean(axis=1)
+    return matriz
@@ -0,0 +1,135 @@
+import argparse
+import datetime
+import os
+import threading
+import time
+
+from pipeline import janelas_tempo, pedidos_padrao, pipeline
+from rastreamento import rastrear_execucao
+
+# Horário do pregão da B3 (Brasília, sem horário de verão)
+FUSO_B3 = datetime.timezone(datetime.timedelta(hours=-3), "BRT")
+ABERTURA = datetime.time(10, 0)
+FECHAMENTO = datetime.time(18, 0)
+# Minutos de antecedência do primeiro aquecimento do dia e intervalo entre atualizações no pregão
+ANTECEDENCIA_MINUTOS = int(os.environ.get("MACROHM_AQUECIMENTO_ANTECEDENCIA", 30))
+INTERVALO_MINUTOS = int(os.environ.get("MACROHM_AQUECIMENTO_INTERVALO", 15))
+
+
+# Aquecedor dos caches: em uma thread de fundo, recalcula os pedidos recentes do pipeline
+# (inclusive os gravados em disco antes de um reinício) e os pedidos padrão das páginas
+# antes da abertura e em intervalos durante o pregão, para que as páginas encontrem os
+# dados prontos (ou sirvam o último retrato enquanto a versão nova é calculada).
+class Aquecedor:
+    def __init__(self, pipeline, intervalo=INTERVALO_MINUTOS, antecedencia=ANTECEDENCIA_MINUTOS,
+                 abertura=ABERTURA, fechamento=FECHAMENTO):
+        self.pipeline = pipeline
+        self.configurar(intervalo, antecedencia, abertura, fechamento)
+        self.ultima_execucao = None
+        self.pedidos = []
+        self.secretos = {}
+        self._thread = None
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+
+    # Altera a agenda (vale a partir da próxima espera)
+    def configurar(self, intervalo=None, antecedencia=None, abertura=None, fechamento=None):
+        if intervalo is not None:
+            self.intervalo = datetime.timedelta(minutes=intervalo)
+        if antecedencia is not None:
+            self.antecedencia = datetime.timedelta(minutes=antecedencia)
+        if abertura is not None:
+            self.abertura = abertura
+        if fechamento is not None:
+            self.fechamento = fechamento
+
+    # Próximo horário de aquecimento: antes da abertura, a cada intervalo durante o pregão
+    # (com uma última atualização no fechamento) e, fora dele, no próximo dia útil
+    def proxima_execucao(self, agora):
+        dia = agora.date()
+        while True:
+            if dia.weekday() < 5:
+                inicio = datetime.datetime.combine(dia, self.abertura, FUSO_B3) - self.antecedencia
+                fim = datetime.datetime.combine(dia, self.fechamento, FUSO_B3)
+                if agora < inicio:
+                    return inicio
+                if agora < fim:
+                    return min(agora + self.intervalo, fim)
+            dia += datetime.timedelta(days=1)
+            agora = datetime.datetime.combine(dia, datetime.time(0, 0), FUSO_B3)
+
+    # Define a chave da GNews usada pelos pedidos padrão e pelos pedidos gravados em disco
+    def configurar_api_key(self, api_key):
+        self.pedidos = pedidos_padrao(api_key)
+        self.secretos = {"api_key": api_key}
+
+    # Recalcula agora os pedidos recentes e os padrão
+    def aquecer(self):
+        with rastrear_execucao("aquecimento"):
+            atualizados = self.pipeline.aquecer(pedidos=self.pedidos, secretos=self.secretos)
+        self.ultima_execucao = time.time()
+        return atualizados
+
+    # Calcula os pedidos padrão que ainda não têm retrato (primeira execução após um deploy);
+    # os que têm retrato vencido são atualizados em segundo plano pelo próprio pipeline
+    def semear(self):
+        with rastrear_execucao("aquecimento"):
+            for parametros, alvos in self.pedidos:
+                parametros = {**parametros, **janelas_tempo()}
+                try:
+                    if self.pipeline.executar_sem_espera(parametros, alvos, calcular=False) is None:
+                        self.pipeline.executar(parametros, alvos)
+                except Exception as e:
+                    print(f"Erro ao semear o pipeline: {e}")
+
+    def _laco(self):
+        self.semear()
+        while not self._parar.is_set():
+            agora = datetime.datetime.now(FUSO_B3)
+            if self._parar.wait((self.proxima_execucao(agora) - agora).total_seconds()):
+                break
+            try:
+                self.aquecer()
+            except Exception as e:
+                print(f"Erro ao aquecer os caches: {e}")
+
+    # Inicia a thread de fundo (uma única vez por processo)
+    def iniciar(self, api_key=None):
+        with self._lock:
+            if api_key is not None and self.secretos.get("api_key") != api_key:
+                self.configurar_api_key(api_key)
+            if self._thread is None or not self._thread.is_alive():
+                self._parar.clear()
+                self._thread = threading.Thread(target=self._laco, name="aquecedor", daemon=True)
+                self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+
+# Função para descrever a idade dos dados exibidos (momento da busca mais antiga usada)
+def descrever_idade(momento, atualizando=False, agora=None):
+    if momento is None:
+        return ""
+    agora = time.time() if agora is None else agora
+    minutos = max(int((agora - momento) // 60), 0)
+    horario = datetime.datetime.fromtimestamp(momento, FUSO_B3).strftime("%d/%m %H:%M")
+    idade = "agora há pouco" if minutos < 1 else f"há {minutos} min" if minutos < 120 else f"há {minutos // 60} h"
+    texto = f"Dados de {horario} ({idade})"
+    return texto + " · atualizando em segundo plano" if atualizando else texto
+
+
+# Instância única por processo, ligada ao pipeline compartilhado pelas páginas
+aquecedor = Aquecedor(pipeline)
+
+
+# Aquecimento avulso (ex.: logo após um deploy): python aquecedor.py [--api-key CHAVE]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calcula e grava os retratos dos pedidos padrão e recentes.")
+    parser.add_argument("--api-key", default=os.environ.get("GNEWS_API_KEY"), help="chave da GNews")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    aquecedor.configurar_api_key(args.api_key)
+    quantidade = aquecedor.aquecer()
+    print(f"{quantidade} pedidos aquecidos em {time.perf_counter() - inicio:.1f}s.")
@@ -0,0 +1,186 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from alocacao import LIMITE_RETORNO_HISTORICO, LIMITE_UPSIDE, calcular_pesos_sugeridos, calcular_upside
+from analise_historica import COLUNA_MEDIA, retornos_anos_similares
+from historico_precos import carregar_painel, carregar_precos_alvo
+from noticias import carregar_noticias
+from regras import marcar_textos
+from setores import indice_setores
+
+REGRAS = ["cenario", "upside"]
+# Meses em que um preço alvo arquivado continua valendo sem nova consulta
+MESES_VALIDADE_ALVO = 3
+MESES_POR_ANO = 12
+COLUNA_CARTEIRA = "Carteira (%)"
+COLUNA_REFERENCIA = "Referência (%)"
+
+
+# Função para reduzir o painel diário (datas × tickers) ao último fechamento de cada mês
+def fechamentos_mensais(precos):
+    return precos.resample("ME").last()
+
+
+# Função para derivar, do arquivo de notícias, os setores favorecidos e em alerta de cada mês
+def sinais_noticias(cenario):
+    noticias = carregar_noticias()
+    if noticias.empty:
+        return {}, {}
+    marcacoes = marcar_textos(noticias["titulo"].tolist(), cenario)
+    meses = pd.to_datetime(noticias["publicado_em"], utc=True).dt.tz_localize(None).dt.to_period("M")
+
+    favoraveis, alerta = {}, {}
+    for mes, setores_bull, setores_bear in zip(meses, marcacoes["favoraveis"], marcacoes["alerta"]):
+        favoraveis.setdefault(mes, set()).update(setores_bull)
+        alerta.setdefault(mes, set()).update(setores_bear)
+    return favoraveis, alerta
+
+
+# Função para montar a matriz meses × tickers que indica os tickers de algum setor sinalizado
+# no mês: (meses × setores) @ (setores × tickers)
+def sinais_por_setor(meses, setores_por_mes, indice, tickers):
+    setores = sorted({setor for lista in setores_por_mes.values() for setor in lista})
+    if not setores:
+        return np.zeros((len(meses), len(tickers)), dtype=bool)
+    posicao = {setor: i for i, setor in enumerate(setores)}
+
+    sinalizados = np.zeros((len(meses), len(setores)))
+    linhas = pd.PeriodIndex(meses, freq="M").get_indexer(pd.PeriodIndex(list(setores_por_mes), freq="M"))
+    for linha, lista in zip(linhas, setores_por_mes.values()):
+        if linha >= 0:
+            sinalizados[linha, [posicao[setor] for setor in lista]] = 1
+
+    pertence = np.zeros((len(setores), len(tickers)))
+    for coluna, ticker in enumerate(tickers):
+        for setor in indice.get(ticker, ()):
+            if setor in posicao:
+                pertence[posicao[setor], coluna] = 1
+    return (sinalizados @ pertence) > 0
+
+
+# Função para calcular, em cada mês, o retorno médio (%) de cada ticker nos anos similares,
+# usando apenas anos já encerrados naquele mês. `anos_similares` é uma lista fixa ou um
+# dicionário mês -> lista (ex.: anos calculados mês a mês pelo comparador de regimes).
+def media_anos_similares(precos, meses, anos_similares):
+    anos = sorted(set(precos.index.year))
+    anuais = retornos_anos_similares(precos, anos).drop(columns=COLUNA_MEDIA).T.to_numpy(dtype=float)
+    disponiveis = np.isfinite(anuais)
+    anuais = np.where(disponiveis, anuais, 0.0)
+
+    # pesos_anos: meses × anos, 1 para cada ano similar já encerrado no mês
+    pesos_anos = np.zeros((len(meses), len(anos)))
+    if isinstance(anos_similares, dict):
+        linhas = pd.PeriodIndex(meses, freq="M").get_indexer(pd.PeriodIndex(list(anos_similares), freq="M"))
+        definidos = np.full(len(meses), -1)
+        for linha, lista in zip(linhas, anos_similares.values()):
+            if linha >= 0:
+                pesos_anos[linha] = np.isin(anos, list(lista))
+                definidos[linha] = linha
+        # Cada mês usa a lista mais recente disponível
+        ultima = np.maximum.accumulate(definidos)
+        pesos_anos = np.where(ultima[:, None] >= 0, pesos_anos[np.maximum(ultima, 0)], 0.0)
+    else:
+        pesos_anos[:] = np.isin(anos, list(anos_similares))
+    pesos_anos *= np.asarray(anos)[None, :] < np.asarray(meses.year)[:, None]
+
+    soma = pesos_anos @ anuais
+    quantidade = pesos_anos @ disponiveis
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(quantidade > 0, soma / quantidade, np.nan)
+
+
+# Função para executar o backtest das regras de alocação, rebalanceando no fim de cada mês.
+# Sinais, pesos e retornos são matrizes meses × tickers calculadas de uma só vez:
+# - regra "cenario": setores favorecidos/em alerta e retorno em anos similares (ajustar_alocacao)
+# - regra "upside": potencial de valorização pelo preço alvo arquivado (ajustar_alocacao_por_upside)
+# Devolve os pesos sugeridos em cada mês e os retornos mensais da carteira e da referência
+# (os pesos atuais, sem ajuste).
+def executar_backtest(precos, pesos, regra="cenario", setores_bull=None, setores_bear=None,
+                      indice=None, anos_similares=(), alvos=None):
+    if regra not in REGRAS:
+        raise ValueError(f"Regra de backtest desconhecida: {regra}")
+    tickers = list(pesos.index)
+    precos = precos.reindex(columns=tickers)
+    mensais = fechamentos_mensais(precos)
+    meses = mensais.index
+    fechamentos = mensais.to_numpy(dtype=float)
+
+    # Só entram na carteira de um mês os tickers com preço no fechamento do mês
+    negociaveis = np.isfinite(fechamentos)
+    base = np.where(negociaveis, pesos.to_numpy(dtype=float)[None, :], 0.0)
+
+    if regra == "cenario":
+        bull = sinais_por_setor(meses, setores_bull or {}, indice or {}, tickers)
+        bear = sinais_por_setor(meses, setores_bear or {}, indice or {}, tickers)
+        retorno_medio = media_anos_similares(precos, meses, anos_similares)
+        aumentar = bull | (retorno_medio > LIMITE_RETORNO_HISTORICO)
+        reduzir = ~bull & bear
+    else:
+        alvos = pd.DataFrame(columns=tickers, dtype=float) if alvos is None else alvos
+        alvos_mensais = (
+            alvos.reindex(columns=tickers).resample("ME").last().reindex(meses).ffill(limit=MESES_VALIDADE_ALVO)
+        )
+        upside = calcular_upside(fechamentos, alvos_mensais.to_numpy(dtype=float))
+        aumentar = upside > LIMITE_UPSIDE
+        reduzir = upside < 0
+
+    _, sugeridos = calcular_pesos_sugeridos(base, aumentar & negociaveis, reduzir & negociaveis)
+    total_base = base.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        referencia = np.where(total_base > 0, base * (100 / total_base), 0.0)
+        # Retorno de cada ticker no mês seguinte; sem preço, a posição fica parada
+        retornos = np.nan_to_num(fechamentos[1:] / fechamentos[:-1] - 1)
+
+    resultado = pd.DataFrame({
+        COLUNA_CARTEIRA: (sugeridos[:-1] / 100 * retornos).sum(axis=1) * 100,
+        COLUNA_REFERENCIA: (referencia[:-1] / 100 * retornos).sum(axis=1) * 100,
+    }, index=meses[1:])
+    return pd.DataFrame(sugeridos, index=meses, columns=tickers), resultado
+
+
+# Função para resumir os retornos mensais do backtest (retorno total e anualizado,
+# volatilidade anualizada e maior queda a partir de um pico)
+def resumo_backtest(retornos):
+    fatores = 1 + retornos / 100
+    acumulado = fatores.cumprod()
+    anos = len(retornos) / MESES_POR_ANO
+    return pd.DataFrame({
+        "Retorno Total (%)": (acumulado.iloc[-1] - 1) * 100,
+        "Retorno Anualizado (%)": (acumulado.iloc[-1] ** (1 / anos) - 1) * 100,
+        "Volatilidade Anual (%)": retornos.std() * np.sqrt(MESES_POR_ANO),
+        "Drawdown Máximo (%)": ((acumulado / acumulado.cummax() - 1) * 100).min(),
+    }).round(2)
+
+
+# Backtest a partir dos dados arquivados: python backtest.py carteira.csv --regra cenario
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest mensal das regras de alocação sobre o histórico arquivado.")
+    parser.add_argument("carteira", help="arquivo CSV com colunas: Ticker, Peso (%%)")
+    parser.add_argument("--regra", choices=REGRAS, default="cenario")
+    parser.add_argument("--cenario", default="macrov3", help="conjunto de regras de regras.json")
+    parser.add_argument("--anos", type=int, nargs="+", default=[2019, 2022], help="anos similares")
+    parser.add_argument("--atualizar", action="store_true", help="atualiza históricos e setores antes do backtest")
+    parser.add_argument("--saida", help="arquivo CSV para os retornos mensais")
+    args = parser.parse_args()
+
+    carteira = pd.read_csv(args.carteira)
+    pesos = carteira.groupby(carteira["Ticker"].astype(str))["Peso (%)"].sum()
+    tickers = list(pesos.index)
+    precos = carregar_painel(tickers, atualizar=args.atualizar)
+    if args.regra == "cenario":
+        setores_bull, setores_bear = sinais_noticias(args.cenario)
+        _, retornos = executar_backtest(
+            precos, pesos, "cenario", setores_bull, setores_bear,
+            indice_setores(tickers, atualizar=args.atualizar), args.anos,
+        )
+    else:
+        _, retornos = executar_backtest(precos, pesos, "upside", alvos=carregar_precos_alvo(tickers))
+
+    if retornos.empty:
+        print("Histórico insuficiente para o backtest (execute com --atualizar para buscar os preços).")
+        raise SystemExit(1)
+    print(resumo_backtest(retornos).to_string())
+    if args.saida:
+        retornos.to_csv(args.saida)
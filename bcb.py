@@ -0,0 +1,164 @@
+import contextlib
+import datetime
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from agendador import agendador
+from chamadas import requisitar
+from cliente_http import bytes_transferidos
+from configuracao import caminho_dados
+from rastreamento import etapa, registrar_cache, registrar_chamada
+
+URL_SGS = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo}/dados"
+ARQUIVO_SGS = "sgs.sqlite"
+
+# Séries do SGS usadas na comparação de regimes econômicos
+INDICADORES = {
+    "ipca": 13522,        # IPCA acumulado em 12 meses
+    "selic": 4189,        # Selic acumulada no mês, anualizada
+    "cambio": 3698,       # Dólar (venda), média mensal
+    "desemprego": 24369,  # Taxa de desocupação (PNAD Contínua)
+}
+JANELA_MESES = 12
+# Fração mínima de valores disponíveis em uma janela para que ela seja comparada
+COBERTURA_MINIMA = 0.5
+# Meses em que um indicador ainda não divulgado repete o último valor
+MESES_DEFASAGEM = 3
+
+
+# Função para abrir o armazenamento local das séries do SGS
+@contextlib.contextmanager
+def _conectar():
+    conn = sqlite3.connect(caminho_dados(ARQUIVO_SGS), timeout=30)
+    try:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS series ("
+                "codigo INTEGER NOT NULL, data TEXT NOT NULL, valor REAL, PRIMARY KEY (codigo, data))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS atualizacoes (codigo INTEGER PRIMARY KEY, verificado_em TEXT NOT NULL)"
+            )
+            yield conn
+    finally:
+        conn.close()
+
+
+# Função para baixar as observações de uma série do SGS, opcionalmente a partir de uma data
+def _baixar_serie(codigo, inicio=None):
+    parametros = {"formato": "json"}
+    if inicio is not None:
+        parametros["dataInicial"] = inicio.strftime("%d/%m/%Y")
+        parametros["dataFinal"] = datetime.date.today().strftime("%d/%m/%Y")
+    r = requisitar("bcb", URL_SGS.format(codigo=codigo), params=parametros)
+    registrar_chamada("bcb", bytes_transferidos(r))
+    # O SGS responde 404 quando não há observações no intervalo pedido
+    if r.status_code == 404 and inicio is not None:
+        return pd.DataFrame(columns=["data", "valor"])
+    dados = r.json()
+    if not isinstance(dados, list):
+        raise RuntimeError(f"Resposta inesperada do SGS para a série {codigo}: {dados}")
+    df = pd.DataFrame(dados, columns=["data", "valor"])
+    df["data"] = pd.to_datetime(df["data"], format="%d/%m/%Y").dt.strftime("%Y-%m-%d")
+    df["valor"] = pd.to_numeric(df["valor"].astype(str).str.replace(",", ".", regex=False), errors="coerce")
+    return df
+
+
+# Função para buscar no SGS apenas as observações posteriores à última armazenada
+def atualizar_serie(codigo):
+    hoje = datetime.date.today().isoformat()
+    with _conectar() as conn:
+        verificado = conn.execute(
+            "SELECT verificado_em FROM atualizacoes WHERE codigo = ?", (codigo,)
+        ).fetchone()
+        if verificado and verificado[0] >= hoje:
+            registrar_cache("sgs", acertos=1)
+            return
+        registrar_cache("sgs", falhas=1)
+        ultima = conn.execute("SELECT MAX(data) FROM series WHERE codigo = ?", (codigo,)).fetchone()[0]
+
+    inicio = datetime.date.fromisoformat(ultima) + datetime.timedelta(days=1) if ultima else None
+    try:
+        novas = _baixar_serie(codigo, inicio)
+    except Exception as e:
+        print(f"Erro ao atualizar a série {codigo} do SGS: {e}")
+        return
+
+    with _conectar() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO series (codigo, data, valor) VALUES (?, ?, ?)",
+            [(codigo, data, None if pd.isna(valor) else float(valor)) for data, valor in novas.itertuples(index=False)],
+        )
+        conn.execute("INSERT OR REPLACE INTO atualizacoes (codigo, verificado_em) VALUES (?, ?)", (codigo, hoje))
+
+
+# Função para ler uma série do SGS do armazenamento local (atualizando-a antes)
+def carregar_serie(codigo):
+    atualizar_serie(codigo)
+    with _conectar() as conn:
+        linhas = conn.execute(
+            "SELECT data, valor FROM series WHERE codigo = ? ORDER BY data", (codigo,)
+        ).fetchall()
+    if not linhas:
+        return pd.Series(dtype=float)
+    datas, valores = zip(*linhas)
+    return pd.Series(valores, index=pd.to_datetime(list(datas)), dtype=float)
+
+
+# Função para montar o painel mensal (meses × indicadores) das séries do SGS
+@etapa
+def painel_mensal(indicadores=None):
+    indicadores = INDICADORES if indicadores is None else indicadores
+    series = agendador.mapear("bcb", carregar_serie, list(indicadores.values()))
+    mensais = {
+        nome: serie.resample("MS").mean() for nome, serie in zip(indicadores, series) if not serie.empty
+    }
+    if not mensais:
+        return pd.DataFrame(columns=list(indicadores), dtype=float)
+    return pd.concat(mensais, axis=1).ffill(limit=MESES_DEFASAGEM)
+
+
+# Comparador de regimes econômicos: cada mês é representado pela janela dos últimos
+# `janela` meses de todos os indicadores (normalizados). As janelas históricas ficam
+# pré-calculadas em uma matriz, e comparar um mês novo é uma única operação matricial.
+class ComparadorRegimes:
+    def __init__(self, painel, janela=JANELA_MESES):
+        self.janela = janela
+        self.indicadores = list(painel.columns)
+        normalizado = (painel - painel.mean()) / painel.std(ddof=0)
+        valores = normalizado.to_numpy(dtype=float)
+        if len(valores) < janela:
+            self.janelas = np.empty((0, janela * len(self.indicadores)))
+            self.fins = pd.DatetimeIndex([])
+            return
+        # (n_janelas, indicadores, meses) -> (n_janelas, indicadores * meses)
+        self.janelas = sliding_window_view(valores, janela, axis=0).reshape(len(valores) - janela + 1, -1)
+        self.fins = painel.index[janela - 1:]
+
+    # Distância (RMS sobre os valores disponíveis) de um vetor de janela a todas as janelas históricas
+    def distancias(self, vetor):
+        diferencas = self.janelas - vetor
+        disponiveis = ~np.isnan(diferencas)
+        quantidade = disponiveis.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            distancias = np.sqrt(np.nansum(diferencas ** 2, axis=1) / quantidade)
+        distancias[quantidade < COBERTURA_MINIMA * self.janelas.shape[1]] = np.inf
+        return distancias
+
+    # Janelas históricas mais próximas da atual (sem sobreposição com ela)
+    def vizinhos(self, k=5):
+        if len(self.janelas) <= self.janela:
+            return pd.DataFrame(columns=["fim", "distancia"])
+        distancias = self.distancias(self.janelas[-1])[:-self.janela]
+        validos = np.flatnonzero(np.isfinite(distancias))
+        ordem = validos[np.argsort(distancias[validos])][:k]
+        return pd.DataFrame({"fim": self.fins[ordem], "distancia": distancias[ordem]})
+
+    # Anos com os regimes mais parecidos com o atual, do mais para o menos parecido
+    def anos_similares(self, n=2):
+        vizinhos = self.vizinhos(len(self.janelas))
+        anos = list(dict.fromkeys(int(ano) for ano in pd.DatetimeIndex(vizinhos["fim"]).year))
+        return anos[:n]
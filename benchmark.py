@@ -0,0 +1,365 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import requests
+import yfinance as yf
+
+import agendador as modulo_agendador
+import chamadas
+import cliente_http
+import configuracao
+from alocacao import ajustar_alocacao
+from bcb import INDICADORES, ComparadorRegimes, painel_mensal
+from cache_mercado import cache_mercado
+from dados_mercado import analise_historica_carteira, get_target_price_yfinance, obter_cotacoes_carteira
+from noticias import ingerir_noticias, noticias_reais, pontuar_pendentes
+from pipeline import pipeline
+from regras import marcar_textos, setores_do_cenario
+from setores import indice_setores
+
+# Benchmark offline: substitui GNews, Yahoo Finance e SGS/BCB por réplicas locais de
+# respostas gravadas (diretório de fixtures) e mede tempo e pico de memória de cada etapa.
+
+DIRETORIO_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures_benchmark")
+TAMANHOS_CARTEIRA = [15, 100, 1000]
+VOLUMES_NOTICIAS = [50, 500, 5000]
+ANOS_SIMILARES = [2019, 2022]
+CARTEIRA_BASE = [
+    "AGRO3.SA", "BBAS3.SA", "BBSE3.SA", "BPAC11.SA", "EGIE3.SA", "ITUB3.SA", "PRIO3.SA", "PSSA3.SA",
+    "SAPR3.SA", "SBSP3.SA", "VIVT3.SA", "WEGE3.SA", "TOTS3.SA", "B3SA3.SA", "TAEE3.SA",
+]
+CAMPOS_INFO = ["targetMeanPrice", "sector", "industry"]
+
+
+# Função para ler as fixtures gravadas
+def carregar_fixtures(diretorio):
+    with open(os.path.join(diretorio, "gnews.json"), encoding="utf-8") as arquivo:
+        artigos = json.load(arquivo)
+    with open(os.path.join(diretorio, "yahoo_info.json"), encoding="utf-8") as arquivo:
+        info = json.load(arquivo)
+    historico = pd.read_csv(os.path.join(diretorio, "yahoo_historico.csv"), index_col=0, parse_dates=True)
+    sgs = {}
+    for codigo in INDICADORES.values():
+        with open(os.path.join(diretorio, f"sgs_{codigo}.json"), encoding="utf-8") as arquivo:
+            sgs[codigo] = json.load(arquivo)
+    return {"artigos": artigos, "info": info, "historico": historico, "sgs": sgs}
+
+
+# Função para gravar fixtures a partir das APIs reais (requer rede e GNEWS_API_KEY)
+def gravar_fixtures(diretorio, api_key):
+    os.makedirs(diretorio, exist_ok=True)
+    r = requests.get(
+        "https://gnews.io/api/v4/search",
+        params={"q": "economia brasil", "lang": "pt", "country": "br", "max": 10, "token": api_key},
+    )
+    with open(os.path.join(diretorio, "gnews.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(r.json().get("articles", []), arquivo, ensure_ascii=False)
+
+    historico = yf.download(CARTEIRA_BASE, start="2017-01-01", auto_adjust=True, progress=False)["Close"]
+    historico.to_csv(os.path.join(diretorio, "yahoo_historico.csv"))
+    info = {}
+    for ticker in CARTEIRA_BASE:
+        dados = yf.Ticker(ticker).info
+        info[ticker] = {campo: dados.get(campo) for campo in CAMPOS_INFO}
+    with open(os.path.join(diretorio, "yahoo_info.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(info, arquivo, ensure_ascii=False)
+
+    for codigo in INDICADORES.values():
+        r = requests.get(f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.{codigo}/dados", params={"formato": "json"})
+        with open(os.path.join(diretorio, f"sgs_{codigo}.json"), "w", encoding="utf-8") as arquivo:
+            json.dump(r.json(), arquivo)
+
+
+# Função para gerar fixtures sintéticas (no formato das respostas reais) quando não há gravação
+def gerar_fixtures_sinteticas(diretorio, semente=42):
+    os.makedirs(diretorio, exist_ok=True)
+    rng = np.random.default_rng(semente)
+
+    datas = pd.bdate_range("2017-01-02", datetime.date.today() - datetime.timedelta(days=1))
+    retornos = rng.normal(0.0003, 0.018, (len(datas), len(CARTEIRA_BASE)))
+    historico = pd.DataFrame(
+        20 * np.exp(np.cumsum(retornos, axis=0)), index=datas, columns=CARTEIRA_BASE
+    ).round(4)
+    historico.to_csv(os.path.join(diretorio, "yahoo_historico.csv"))
+
+    setores = [
+        ("Consumer Defensive", "Farm Products"), ("Financial Services", "Banks - Regional"),
+        ("Utilities", "Utilities - Renewable"), ("Technology", "Software - Application"),
+        ("Energy", "Oil & Gas E&P"), ("Industrials", "Specialty Industrial Machinery"),
+    ]
+    info = {}
+    for i, ticker in enumerate(CARTEIRA_BASE):
+        setor, industria = setores[i % len(setores)]
+        alvo = float(historico[ticker].iloc[-1] * rng.uniform(0.8, 1.4))
+        info[ticker] = {"targetMeanPrice": round(alvo, 2), "sector": setor, "industry": industria}
+    with open(os.path.join(diretorio, "yahoo_info.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(info, arquivo, ensure_ascii=False)
+
+    meses = pd.date_range("1995-01-01", datetime.date.today(), freq="MS")
+    niveis = {13522: 6.0, 4189: 12.0, 3698: 3.0, 24369: 10.0}
+    for codigo, nivel in niveis.items():
+        inicio = meses >= ("2012-03-01" if codigo == 24369 else "1995-01-01")
+        valores = nivel + np.cumsum(rng.normal(0, 0.3, inicio.sum()))
+        serie = [
+            {"data": data.strftime("%d/%m/%Y"), "valor": f"{valor:.2f}".replace(".", ",")}
+            for data, valor in zip(meses[inicio], valores)
+        ]
+        with open(os.path.join(diretorio, f"sgs_{codigo}.json"), "w", encoding="utf-8") as arquivo:
+            json.dump(serie, arquivo)
+
+    temas = [
+        "Inflação volta a subir e pressiona juros altos", "Governo anuncia gastos públicos em infraestrutura",
+        "Desemprego em queda impulsiona consumo das famílias", "Tarifa sobre importação afeta exportação",
+        "Crescimento econômico surpreende e PIB avança", "Expansão do crédito anima bancos",
+    ]
+    agora = datetime.datetime.now(datetime.timezone.utc)
+    artigos = [
+        {
+            "title": f"{temas[i % len(temas)]} ({i})",
+            "description": f"Resumo sintético número {i} sobre {temas[(i * 7) % len(temas)].lower()}",
+            "url": f"https://exemplo.local/{i}",
+            "publishedAt": (agora - datetime.timedelta(minutes=30 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "source": {"name": "Fixture"},
+        }
+        for i in range(60)
+    ]
+    with open(os.path.join(diretorio, "gnews.json"), "w", encoding="utf-8") as arquivo:
+        json.dump(artigos, arquivo, ensure_ascii=False)
+
+
+# Resposta HTTP mínima usada pelas réplicas
+class _Resposta:
+    def __init__(self, dados, status_code=200):
+        self._dados = dados
+        self.status_code = status_code
+        self.content = json.dumps(dados).encode("utf-8")
+        self.headers = {}
+
+    def json(self):
+        return self._dados
+
+
+# Réplica local das APIs externas, a partir das fixtures
+class ReplicaAPIs:
+    def __init__(self, fixtures, volume_noticias=50):
+        self.fixtures = fixtures
+        self.volume_noticias = volume_noticias
+        self.artigos = self._expandir_artigos(volume_noticias)
+        self._historico = fixtures["historico"]
+        self._originais = {}
+
+    # Gera `volume` artigos distintos a partir dos gravados (palavras recombinadas)
+    def _expandir_artigos(self, volume):
+        base = self.fixtures["artigos"]
+        palavras = sorted({p for a in base for p in f"{a['title']} {a.get('description') or ''}".split()})
+        rng = np.random.default_rng(volume)
+        agora = datetime.datetime.now(datetime.timezone.utc)
+        artigos = []
+        for i in range(volume):
+            original = base[i % len(base)]
+            if i < len(base):
+                artigos.append(original)
+                continue
+            titulo = " ".join(rng.choice(palavras, size=12))
+            artigos.append(dict(
+                original, title=titulo, description=" ".join(rng.choice(palavras, size=20)),
+                publishedAt=(agora - datetime.timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            ))
+        return sorted(artigos, key=lambda a: a["publishedAt"], reverse=True)
+
+    # Ticker gravado correspondente (os sintéticos têm o formato BASE-N.SA)
+    def _base(self, ticker):
+        raiz, _, sufixo = ticker.partition(".")
+        raiz = raiz.split("-")[0]
+        return f"{raiz}.{sufixo}" if f"{raiz}.{sufixo}" in self._historico.columns else CARTEIRA_BASE[0]
+
+    def _get(self, url, params=None, **kwargs):
+        params = params or {}
+        if "gnews.io" in url:
+            desde, ate = params.get("from"), params.get("to")
+            artigos = [
+                a for a in self.artigos
+                if (not desde or a["publishedAt"] >= desde) and (not ate or a["publishedAt"] <= ate)
+            ]
+            pagina, por_pagina = int(params.get("page", 1)), int(params.get("max", 10))
+            return _Resposta({"totalArticles": len(artigos), "articles": artigos[(pagina - 1) * por_pagina:pagina * por_pagina]})
+        if "api.bcb.gov.br" in url:
+            codigo = int(url.split("bcdata.sgs.")[1].split("/")[0])
+            serie = self.fixtures["sgs"][codigo]
+            if "dataInicial" in params:
+                inicio = pd.to_datetime(params["dataInicial"], format="%d/%m/%Y")
+                serie = [o for o in serie if pd.to_datetime(o["data"], format="%d/%m/%Y") >= inicio]
+                if not serie:
+                    return _Resposta({"erro": "sem dados"}, 404)
+            return _Resposta(serie)
+        raise RuntimeError(f"URL sem réplica no benchmark: {url}")
+
+    def _download(self, tickers, period="5d", **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        ultimos = self._historico.iloc[-5:]
+        fechamentos = pd.DataFrame({t.upper(): ultimos[self._base(t)].to_numpy() for t in tickers}, index=ultimos.index)
+        fechamentos.columns = pd.MultiIndex.from_product([["Close"], fechamentos.columns])
+        return fechamentos
+
+    def _ticker(self, ticker):
+        replica = self
+
+        class _Ticker:
+            @property
+            def info(self):
+                return dict(replica.fixtures["info"].get(replica._base(ticker), {}))
+
+            def history(self, start=None, end=None, period=None, **kwargs):
+                serie = replica._historico[replica._base(ticker)]
+                if start:
+                    serie = serie[serie.index >= pd.Timestamp(start)]
+                if end:
+                    serie = serie[serie.index < pd.Timestamp(end)]
+                return pd.DataFrame({"Close": serie.dropna()})
+
+        return _Ticker()
+
+    def __enter__(self):
+        self._originais = {"get": requests.get, "download": yf.download, "Ticker": yf.Ticker}
+        requests.get = self._get
+        cliente_http.sessao.get = self._get
+        yf.download = self._download
+        yf.Ticker = self._ticker
+        return self
+
+    def __exit__(self, *exc):
+        requests.get = self._originais["get"]
+        del cliente_http.sessao.get
+        yf.download = self._originais["download"]
+        yf.Ticker = self._originais["Ticker"]
+
+
+# Função para montar uma carteira com `tamanho` ativos a partir da carteira gravada
+def montar_carteira(tamanho):
+    tickers = [
+        CARTEIRA_BASE[i] if i < len(CARTEIRA_BASE)
+        else CARTEIRA_BASE[i % len(CARTEIRA_BASE)].replace(".SA", f"-{i}.SA")
+        for i in range(tamanho)
+    ]
+    return pd.DataFrame({"Ticker": tickers, "Peso (%)": np.round(100 / tamanho, 4)})
+
+
+# Função para medir tempo e pico de memória de uma etapa
+def medir(estagio, funcao, **contexto):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    erro = None
+    try:
+        funcao()
+    except Exception as e:
+        erro = f"{type(e).__name__}: {e}"
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    resultado = {"estagio": estagio, **contexto, "segundos": round(segundos, 6), "pico_memoria_mb": round(pico / 2**20, 3)}
+    if erro:
+        resultado["erro"] = erro
+    return resultado
+
+
+# Função para apontar os armazenamentos locais para um diretório vazio e limpar o estado do processo
+# (cache em memória, resultados do pipeline e disjuntores dos provedores)
+def _estado_frio(base):
+    configuracao.DIRETORIO_DADOS = tempfile.mkdtemp(dir=base)
+    cache_mercado.invalidar()
+    pipeline.limpar()
+    with chamadas._lock:
+        chamadas._disjuntores.clear()
+
+
+# Função para executar as etapas para um tamanho de carteira: cada etapa é medida a partir do
+# estado frio (sem o que as etapas anteriores deixaram em cache) e, logo em seguida, quente
+def medir_carteira(tamanho, base):
+    carteira = montar_carteira(tamanho)
+    tickers = carteira["Ticker"].tolist()
+    etapas = [
+        ("get_target_price_yfinance", lambda: [get_target_price_yfinance(t) for t in tickers[:15]]),
+        ("obter_cotacoes_carteira", lambda: obter_cotacoes_carteira(tickers)),
+        ("analise_historica_anos_similares", lambda: analise_historica_carteira(tickers, ANOS_SIMILARES)),
+        ("obter_anos_similares", lambda: ComparadorRegimes(painel_mensal()).anos_similares(2)),
+        ("indice_setores", lambda: indice_setores(tickers)),
+        ("ajustar_alocacao", lambda: ajustar_alocacao(carteira, ["tecnologia"], ["bancos"], ANOS_SIMILARES)),
+    ]
+    resultados = []
+    for estagio, funcao in etapas:
+        _estado_frio(base)
+        for execucao in ("fria", "quente"):
+            resultados.append(medir(estagio, funcao, tamanho_carteira=tamanho, execucao=execucao))
+    return resultados
+
+
+# Função para executar as etapas de notícias para um volume de artigos
+def medir_noticias(volume, base, replica):
+    _estado_frio(base)
+    paginas = max(1, volume // 10)
+    titulos = [artigo["title"] for artigo in replica.artigos]
+    return [
+        medir("ingerir_noticias", lambda: ingerir_noticias("benchmark", max_paginas=paginas), volume_noticias=volume),
+        medir("analisar_sentimentos", pontuar_pendentes, volume_noticias=volume),
+        medir("noticias_reais", lambda: noticias_reais("benchmark"), volume_noticias=volume),
+        medir("marcar_textos", lambda: marcar_textos(titulos, "macrov3"), volume_noticias=volume),
+    ]
+
+
+# Função para executar o fluxo completo, como nas páginas do Streamlit
+def fluxo_completo(tamanho):
+    carteira = montar_carteira(tamanho)
+    noticias = noticias_reais("benchmark")
+    setores_bull, setores_bear = setores_do_cenario(noticias, "macrov3")
+    anos = ComparadorRegimes(painel_mensal()).anos_similares(2) or ANOS_SIMILARES
+    ajustar_alocacao(carteira, setores_bull, setores_bear, anos)
+
+
+def executar(fixtures, tamanhos, volumes):
+    # Sem rede real, os limites de taxa só mediriam esperas artificiais
+    for provedor in modulo_agendador.PROVEDORES:
+        modulo_agendador.agendador.configurar(provedor, concorrencia=16, taxa=1e9, rajada=1e9)
+
+    base = tempfile.mkdtemp(prefix="macrohm_benchmark_")
+    resultados = []
+    for volume in volumes:
+        with ReplicaAPIs(fixtures, volume) as replica:
+            resultados += medir_noticias(volume, base, replica)
+    with ReplicaAPIs(fixtures) as replica:
+        for tamanho in tamanhos:
+            resultados += medir_carteira(tamanho, base)
+            _estado_frio(base)
+            resultados.append(medir("fluxo_completo", lambda: fluxo_completo(tamanho), tamanho_carteira=tamanho, execucao="fria"))
+            resultados.append(medir("fluxo_completo", lambda: fluxo_completo(tamanho), tamanho_carteira=tamanho, execucao="quente"))
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark offline das etapas do MACROHM com respostas gravadas.")
+    parser.add_argument("--fixtures", default=DIRETORIO_FIXTURES)
+    parser.add_argument("--gravar", action="store_true", help="grava novas fixtures a partir das APIs reais")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_CARTEIRA)
+    parser.add_argument("--volumes", type=int, nargs="+", default=VOLUMES_NOTICIAS)
+    parser.add_argument("--saida", help="arquivo JSON lines para os resultados (padrão: saída padrão)")
+    args = parser.parse_args()
+
+    if args.gravar:
+        gravar_fixtures(args.fixtures, os.environ["GNEWS_API_KEY"])
+    elif not os.path.exists(os.path.join(args.fixtures, "gnews.json")):
+        print(f"Fixtures não encontradas; gerando fixtures sintéticas em {args.fixtures}", file=sys.stderr)
+        gerar_fixtures_sinteticas(args.fixtures)
+
+    resultados = executar(carregar_fixtures(args.fixtures), args.tamanhos, args.volumes)
+    saida = open(args.saida, "w", encoding="utf-8") if args.saida else sys.stdout
+    for resultado in resultados:
+        saida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    if args.saida:
+        saida.close()
@@ -0,0 +1,85 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+
+from rastreamento import registrar_cache
+
+# Valores padrão do cache compartilhado de dados de mercado
+CAPACIDADE_PADRAO = 5000
+TTL_PADRAO = 6 * 60 * 60
+TTL_COTACAO = 15 * 60
+# Tempo em que uma busca que falhou não é repetida
+TTL_FALHA = 2 * 60
+# Valor guardado no lugar de uma busca que falhou (diferente de um None vindo do provedor)
+BUSCA_FALHOU = object()
+
+
+# Cache em memória com expiração (TTL), limite de tamanho (LRU) e invalidação explícita.
+# As chaves seguem o formato (ticker, campo, data, parâmetros).
+class CacheMercado:
+    def __init__(self, capacidade=CAPACIDADE_PADRAO, ttl=TTL_PADRAO):
+        self.capacidade = capacidade
+        self.ttl = ttl
+        self._itens = OrderedDict()
+        self._lock = threading.RLock()
+        self.acertos = 0
+        self.falhas = 0
+
+    # Retorna (encontrado, valor); entradas expiradas são descartadas
+    def obter(self, chave):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                registrar_cache("mercado", falhas=1)
+                return False, None
+            expira_em, valor = item
+            if expira_em < time.monotonic():
+                del self._itens[chave]
+                self.falhas += 1
+                registrar_cache("mercado", falhas=1)
+                return False, None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            registrar_cache("mercado", acertos=1)
+            return True, valor
+
+    def guardar(self, chave, valor, ttl=None):
+        with self._lock:
+            self._itens[chave] = (time.monotonic() + (self.ttl if ttl is None else ttl), valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+
+    # Busca no cache e, se não houver, chama a função e guarda o resultado
+    def obter_ou_buscar(self, chave, funcao, ttl=None):
+        encontrado, valor = self.obter(chave)
+        if encontrado:
+            return valor
+        valor = funcao()
+        self.guardar(chave, valor, ttl)
+        return valor
+
+    # Remove as entradas de um ticker e/ou campo; sem argumentos, limpa tudo
+    def invalidar(self, ticker=None, campo=None):
+        with self._lock:
+            if ticker is None and campo is None:
+                self._itens.clear()
+                return
+            for chave in list(self._itens):
+                if (ticker is None or chave[0] == ticker) and (campo is None or chave[1] == campo):
+                    del self._itens[chave]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._itens)
+
+
+# Função para montar a chave (ticker, campo, data, parâmetros) usada no cache
+def chave_mercado(ticker, campo, data=None, parametros=()):
+    return (ticker, campo, (data or datetime.date.today()).isoformat(), parametros)
+
+
+# Instância única por processo, compartilhada por todas as sessões do Streamlit
+cache_mercado = CacheMercado()
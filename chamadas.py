@@ -0,0 +1,224 @@
+import contextlib
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from cliente_http import get_condicional
+
+# Prazo (s) de cada tentativa por provedor
+PRAZOS = {"yahoo": 10.0, "gnews": 8.0, "bcb": 15.0}
+PRAZO_PADRAO = 10.0
+# Tentativas por chamada e espera (s) do backoff exponencial com jitter
+TENTATIVAS = 3
+ESPERA_BASE = 0.5
+ESPERA_MAXIMA = 4.0
+# Disjuntor por provedor: falhas seguidas que abrem o circuito e tempo (s) até nova tentativa
+FALHAS_PARA_ABRIR = 5
+SEGUNDOS_ABERTO = 60.0
+# Orçamento de tempo (s) das buscas externas de uma página
+ORCAMENTO_PAGINA = 20.0
+# Respostas HTTP que indicam falha temporária do provedor (além de 5xx)
+STATUS_REPETIR = {408, 429}
+# Threads que executam as chamadas com prazo (uma chamada travada ocupa uma delas até terminar)
+MAX_THREADS = 32
+
+_prazo_total = contextvars.ContextVar("prazo_total", default=None)
+_falhas = contextvars.ContextVar("falhas_chamadas", default=None)
+
+
+class CircuitoAberto(Exception):
+    pass
+
+
+class PrazoEsgotado(Exception):
+    pass
+
+
+# Resposta do provedor que indica falha temporária (5xx, 408, 429)
+class FalhaTemporaria(RuntimeError):
+    pass
+
+
+# Erros que justificam nova tentativa e contam para o disjuntor: prazo, falhas de conexão e
+# respostas temporárias. Os demais (ex.: ticker inexistente) são resultados definitivos.
+# Cada provedor acrescenta os seus com tratar_como_temporario().
+_erros_temporarios = (PrazoEsgotado, FalhaTemporaria, TimeoutError, ConnectionError)
+
+
+# Disjuntor de um provedor: depois de várias falhas seguidas, as chamadas falham na hora
+# (usando os dados já guardados) até passar o tempo de espera; então uma chamada de teste
+# é liberada e, se der certo, o circuito volta a fechar.
+class Disjuntor:
+    def __init__(self, falhas_para_abrir=FALHAS_PARA_ABRIR, segundos_aberto=SEGUNDOS_ABERTO):
+        self.falhas_para_abrir = falhas_para_abrir
+        self.segundos_aberto = segundos_aberto
+        self.falhas = 0
+        self._aberto_em = None
+        self._testando = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        with self._lock:
+            if self._aberto_em is None:
+                return "fechado"
+            return "aberto" if time.monotonic() - self._aberto_em < self.segundos_aberto else "meio aberto"
+
+    # Indica se uma chamada pode ser feita agora
+    def permitir(self):
+        with self._lock:
+            if self._aberto_em is None:
+                return True
+            if self._testando or time.monotonic() - self._aberto_em < self.segundos_aberto:
+                return False
+            self._testando = True
+            return True
+
+    def sucesso(self):
+        with self._lock:
+            self.falhas = 0
+            self._aberto_em = None
+            self._testando = False
+
+    def falha(self):
+        with self._lock:
+            self.falhas += 1
+            if self._testando or self.falhas >= self.falhas_para_abrir:
+                self._aberto_em = time.monotonic()
+            self._testando = False
+
+    # Encerra a chamada de teste sem contar sucesso nem falha (erro definitivo de uma chamada)
+    def liberar(self):
+        with self._lock:
+            self._testando = False
+
+
+_disjuntores = {}
+_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix="chamada")
+
+
+# Função para obter o disjuntor de um provedor (um por processo)
+def disjuntor(provedor):
+    with _lock:
+        if provedor not in _disjuntores:
+            _disjuntores[provedor] = Disjuntor()
+        return _disjuntores[provedor]
+
+
+# Função para obter o prazo (s) de uma tentativa de chamada a um provedor
+def prazo(provedor):
+    return PRAZOS.get(provedor, PRAZO_PADRAO)
+
+
+# Limita o tempo total das chamadas externas feitas dentro do bloco (inclusive nas threads
+# do agendador, que herdam o contexto). Esgotado o orçamento, as chamadas falham na hora.
+@contextlib.contextmanager
+def orcamento(segundos=ORCAMENTO_PAGINA):
+    limite = time.monotonic() + segundos
+    anterior = _prazo_total.get()
+    token = _prazo_total.set(limite if anterior is None else min(anterior, limite))
+    try:
+        yield
+    finally:
+        _prazo_total.reset(token)
+
+
+# Função para obter o tempo (s) que resta do orçamento atual (None se não houver orçamento)
+def tempo_restante():
+    limite = _prazo_total.get()
+    return None if limite is None else max(limite - time.monotonic(), 0.0)
+
+
+# Função para incluir tipos de exceção de um provedor entre os erros temporários
+def tratar_como_temporario(*tipos):
+    global _erros_temporarios
+    _erros_temporarios = tuple(dict.fromkeys(_erros_temporarios + tipos))
+
+
+# Função para dizer se um erro é temporário (vale tentar de novo) ou definitivo. Erros com
+# resposta HTTP seguem o status; as demais falhas de E/S (requests, curl_cffi) são de rede.
+def erro_temporario(erro):
+    if isinstance(erro, _erros_temporarios):
+        return True
+    status = getattr(getattr(erro, "response", None), "status_code", None)
+    if status is not None:
+        return status >= 500 or status in STATUS_REPETIR
+    return isinstance(erro, OSError)
+
+
+# Registra as chamadas que desistiram (por prazo, disjuntor ou falhas) dentro do bloco,
+# para que quem as usou saiba que o resultado saiu incompleto
+@contextlib.contextmanager
+def monitorar_falhas():
+    falhas = []
+    token = _falhas.set(falhas)
+    try:
+        yield falhas
+    finally:
+        _falhas.reset(token)
+
+
+# Função para registrar, no bloco monitorado atual, que um dado de um provedor ficou faltando
+# (também quando a falha vem de um cache de falhas recentes, sem nova chamada)
+def registrar_falha(provedor, motivo):
+    falhas = _falhas.get()
+    if falhas is not None:
+        falhas.append((provedor, str(motivo)))
+
+
+def _desistir(provedor, erro):
+    registrar_falha(provedor, erro)
+    raise erro
+
+
+# Função para chamar um provedor externo com prazo por tentativa, novas tentativas com
+# backoff exponencial e jitter, disjuntor por provedor e o orçamento da página.
+# Levanta a última exceção quando desiste; quem chama usa os dados guardados. Erros definitivos
+# (ver erro_temporario) sobem na hora, sem nova tentativa e sem contar para o disjuntor.
+def chamar(provedor, funcao, *args, **kwargs):
+    circuito = disjuntor(provedor)
+    erro = None
+    for tentativa in range(TENTATIVAS):
+        restante = tempo_restante()
+        if restante is not None and restante <= 0:
+            _desistir(provedor, PrazoEsgotado(f"Orçamento de tempo esgotado antes de chamar {provedor}"))
+        if not circuito.permitir():
+            _desistir(provedor, CircuitoAberto(f"Circuito aberto para {provedor} após falhas seguidas"))
+
+        limite = prazo(provedor) if restante is None else min(prazo(provedor), restante)
+        futuro = _pool.submit(contextvars.copy_context().run, funcao, *args, **kwargs)
+        if wait([futuro], timeout=limite).done:
+            try:
+                resultado = futuro.result()
+                circuito.sucesso()
+                return resultado
+            except Exception as e:
+                erro = e
+                if not erro_temporario(e):
+                    circuito.liberar()
+                    raise
+        else:
+            erro = PrazoEsgotado(f"{provedor} sem resposta em {limite:.1f}s")
+        circuito.falha()
+
+        if tentativa < TENTATIVAS - 1:
+            espera = random.uniform(0, min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** tentativa))
+            restante = tempo_restante()
+            time.sleep(espera if restante is None else min(espera, restante))
+    _desistir(provedor, erro)
+
+
+# Função para fazer um GET HTTP (sessão compartilhada, condicional) por meio de chamar():
+# respostas 5xx, 408 e 429 contam como falha temporária (nova tentativa); as demais são
+# devolvidas para quem chamou tratar
+def requisitar(provedor, url, **kwargs):
+    def buscar():
+        resposta = get_condicional(url, timeout=prazo(provedor), **kwargs)
+        if resposta.status_code >= 500 or resposta.status_code in STATUS_REPETIR:
+            raise FalhaTemporaria(f"{provedor} respondeu HTTP {resposta.status_code}")
+        return resposta
+
+    return chamar(provedor, buscar)
@@ -0,0 +1,148 @@
+import contextlib
+import datetime
+import hashlib
+import sqlite3
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from configuracao import caminho_dados
+from rastreamento import registrar_cache
+
+ARQUIVO_RESPOSTAS = "respostas_http.sqlite"
+# Hosts e conexões por host mantidas abertas (keep-alive) no pool compartilhado
+HOSTS_NO_POOL = 8
+CONEXOES_POR_HOST = 16
+# Parâmetros que mudam a cada execução (intervalos de datas, paginação): requisições com eles
+# não se repetem e por isso suas respostas não são guardadas para revalidação
+PARAMETROS_VOLATEIS = ("dataInicial", "dataFinal", "from", "to", "page")
+# Limites do armazenamento de respostas: idade e quantidade máximas
+IDADE_MAXIMA_RESPOSTAS_DIAS = 30
+MAX_RESPOSTAS = 500
+
+
+# Função para criar a sessão HTTP compartilhada: conexões reaproveitadas entre chamadas
+# (sem novo handshake TLS a cada busca) e respostas comprimidas
+def _criar_sessao():
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=HOSTS_NO_POOL, pool_maxsize=CONEXOES_POR_HOST)
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    sessao.headers.update({"Accept-Encoding": "gzip, deflate", "Accept": "application/json"})
+    return sessao
+
+
+# Função para abrir o armazenamento das últimas respostas com validadores (ETag/Last-Modified)
+@contextlib.contextmanager
+def _conectar():
+    conn = sqlite3.connect(caminho_dados(ARQUIVO_RESPOSTAS), timeout=30)
+    try:
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS respostas ("
+                "chave TEXT PRIMARY KEY, etag TEXT, modificado_em TEXT, tipo TEXT, "
+                "conteudo BLOB NOT NULL, guardado_em TEXT NOT NULL)"
+            )
+            yield conn
+    finally:
+        conn.close()
+
+
+# Função para identificar uma requisição (URL e parâmetros); o hash evita guardar chaves de API
+def _chave(url, params):
+    itens = sorted((str(k), str(v)) for k, v in (params or {}).items())
+    return hashlib.sha1(repr((url, itens)).encode("utf-8")).hexdigest()
+
+
+# Função para verificar se a requisição traz parâmetros que mudam a cada execução
+def _volatil(params):
+    return any(parametro in (params or {}) for parametro in PARAMETROS_VOLATEIS)
+
+
+# Função para descartar as respostas guardadas há mais tempo que o limite e as excedentes
+def _podar(conn):
+    limite = datetime.datetime.now() - datetime.timedelta(days=IDADE_MAXIMA_RESPOSTAS_DIAS)
+    conn.execute("DELETE FROM respostas WHERE guardado_em < ?", (limite.isoformat(timespec="seconds"),))
+    conn.execute(
+        "DELETE FROM respostas WHERE chave NOT IN "
+        "(SELECT chave FROM respostas ORDER BY guardado_em DESC LIMIT ?)",
+        (MAX_RESPOSTAS,),
+    )
+
+
+# Função para remontar a resposta guardada quando o servidor responde 304 (não modificado)
+def _resposta_guardada(resposta, tipo, conteudo):
+    guardada = requests.Response()
+    guardada.status_code = 200
+    guardada._content = conteudo
+    guardada.headers = CaseInsensitiveDict(resposta.headers)
+    if tipo:
+        guardada.headers["Content-Type"] = tipo
+    guardada.url = resposta.url
+    guardada.request = resposta.request
+    return guardada
+
+
+# Função para fazer um GET pela sessão compartilhada com requisição condicional: se já houver
+# resposta guardada com ETag/Last-Modified, envia If-None-Match/If-Modified-Since e, com 304,
+# devolve o conteúdo guardado sem baixá-lo de novo. A resposta traz em `bytes_transferidos`
+# o que trafegou de fato (ver bytes_transferidos()).
+def get_condicional(url, params=None, **kwargs):
+    chave = _chave(url, params)
+    with _conectar() as conn:
+        guardada = conn.execute(
+            "SELECT etag, modificado_em, tipo, conteudo FROM respostas WHERE chave = ?", (chave,)
+        ).fetchone()
+
+    cabecalhos = dict(kwargs.pop("headers", None) or {})
+    if guardada:
+        etag, modificado_em, _, _ = guardada
+        if etag:
+            cabecalhos["If-None-Match"] = etag
+        if modificado_em:
+            cabecalhos["If-Modified-Since"] = modificado_em
+
+    resposta = sessao.get(url, params=params, headers=cabecalhos, **kwargs)
+    if resposta.status_code == 304 and guardada:
+        registrar_cache("http", acertos=1)
+        reaproveitada = _resposta_guardada(resposta, guardada[2], guardada[3])
+        reaproveitada.bytes_transferidos = len(resposta.content)
+        return reaproveitada
+
+    registrar_cache("http", falhas=1)
+    try:
+        # Content-Length é o tamanho recebido (comprimido, quando o servidor comprime)
+        resposta.bytes_transferidos = int(resposta.headers["Content-Length"])
+    except (KeyError, ValueError):
+        resposta.bytes_transferidos = len(resposta.content)
+    etag, modificado_em = resposta.headers.get("ETag"), resposta.headers.get("Last-Modified")
+    if resposta.status_code == 200 and (etag or modificado_em) and not _volatil(params):
+        with _conectar() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO respostas (chave, etag, modificado_em, tipo, conteudo, guardado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    chave, etag, modificado_em, resposta.headers.get("Content-Type"), resposta.content,
+                    datetime.datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+            _podar(conn)
+    return resposta
+
+
+# Função para obter quantos bytes uma resposta trafegou: 0 quando o servidor respondeu 304 e o
+# conteúdo veio do armazenamento local
+def bytes_transferidos(resposta):
+    return getattr(resposta, "bytes_transferidos", len(resposta.content))
+
+
+# Função para apagar as respostas guardadas (a próxima busca baixa tudo de novo)
+def limpar_respostas():
+    with _conectar() as conn:
+        conn.execute("DELETE FROM respostas")
+
+
+# Sessão única por processo, compartilhada pelas páginas e pelas threads do agendador
+sessao = _criar_sessao()
@@ -0,0 +1,12 @@
+import os
+
+# Diretório local onde ficam os dados persistidos (históricos, caches, arquivos de notícias)
+DIRETORIO_DADOS = os.environ.get(
+    "MACROHM_DADOS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "dados")
+)
+
+
+# Função para montar o caminho de um arquivo dentro do diretório de dados
+def caminho_dados(nome):
+    os.makedirs(DIRETORIO_DADOS, exist_ok=True)
+    return os.path.join(DIRETORIO_DADOS, nome)
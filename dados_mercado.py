@@ -0,0 +1,183 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFRateLimitError
+
+from agendador import agendador
+from cache_mercado import BUSCA_FALHOU, TTL_COTACAO, TTL_FALHA, cache_mercado, chave_mercado
+from chamadas import chamar, erro_temporario, prazo, registrar_falha, tratar_como_temporario
+from analise_historica import COLUNA_MEDIA, retornos_anos_similares
+from historico_precos import arquivar_precos_alvo
+from info_yahoo import buscar_info
+from precos_compartilhados import carregar_painel_compartilhado
+from rastreamento import etapa, registrar_chamada
+from setores import indice_setores
+
+COLUNAS_COTACAO = ["Preço Atual", "Preço Alvo"]
+# Tickers buscados ao mesmo tempo pelo fluxo de dados da carteira (as chamadas ao Yahoo
+# continuam limitadas pelo agendador)
+THREADS_FLUXO = 8
+
+
+# Limite de taxa do Yahoo passa com o tempo: conta como falha temporária
+tratar_como_temporario(YFRateLimitError)
+
+
+# Função para normalizar a lista de tickers (sem duplicados, mantendo a ordem)
+def _normalizar_tickers(tickers):
+    return list(dict.fromkeys(t for t in tickers if isinstance(t, str) and t))
+
+
+# Função para buscar o último fechamento de vários tickers em um único download
+def _buscar_fechamentos(tickers):
+    try:
+        dados = chamar(
+            "yahoo", yf.download, tickers, period="5d", auto_adjust=True, progress=False, threads=True,
+            timeout=prazo("yahoo"),
+        )
+        registrar_chamada("yahoo")
+        fechamentos = dados["Close"]
+        if isinstance(fechamentos, pd.Series):
+            fechamentos = fechamentos.to_frame(tickers[0])
+        fechamentos.columns = [str(c).upper() for c in fechamentos.columns]
+        ultimos = fechamentos.ffill().iloc[-1]
+        return {t: ultimos.get(t.upper()) for t in tickers}
+    except Exception as e:
+        registrar_chamada("yahoo", erro=True)
+        print(f"Erro ao buscar cotações da carteira: {e}")
+        # Erro definitivo (ex.: nenhum ticker existe): resultado sem preço, guardado como os demais
+        return {} if erro_temporario(e) else {t: None for t in tickers}
+
+
+# Função para buscar o preço alvo dos analistas de um ticker. Devolve (concluída, alvo): um
+# ticker inexistente conclui sem alvo; só falhas temporárias ficam para nova busca.
+def _buscar_preco_alvo(ticker):
+    concluida, info = buscar_info(ticker)
+    return concluida, info.get("targetMeanPrice")
+
+
+# Função para buscar o preço alvo de vários tickers em paralelo (limitado pelo agendador)
+def _buscar_precos_alvo(tickers):
+    resultados = agendador.mapear("yahoo", _buscar_preco_alvo, tickers)
+    alvos = {ticker: alvo for ticker, (sucesso, alvo) in zip(tickers, resultados) if sucesso}
+    # Os alvos consultados ficam arquivados para reproduzir a regra de upside no backtest
+    try:
+        arquivar_precos_alvo(alvos)
+    except Exception as e:
+        print(f"Erro ao arquivar preços alvo: {e}")
+    return alvos
+
+
+# Função para ler um campo do cache e buscar na rede, em lote, apenas os tickers que faltam.
+# Falhas de rede ficam guardadas (sem valor) só por pouco tempo, para que um ticker com
+# problema não seja buscado de novo a cada execução. Toda falha, inclusive a lida desse cache,
+# é registrada em chamadas.monitorar_falhas: o resultado incompleto não é guardado pelo pipeline.
+def _obter_campo(tickers, campo, buscar, ttl=None, parametros=(), provedor="yahoo"):
+    valores = {}
+    faltando = []
+    for ticker in tickers:
+        encontrado, valor = cache_mercado.obter(chave_mercado(ticker, campo, parametros=parametros))
+        if not encontrado:
+            faltando.append(ticker)
+        elif valor is BUSCA_FALHOU:
+            registrar_falha(provedor, f"{campo} de {ticker} indisponível (falha recente)")
+        else:
+            valores[ticker] = valor
+
+    if faltando:
+        encontrados = buscar(faltando)
+        for ticker in faltando:
+            if ticker in encontrados:
+                valores[ticker] = encontrados[ticker]
+                cache_mercado.guardar(chave_mercado(ticker, campo, parametros=parametros), valores[ticker], ttl)
+            else:
+                registrar_falha(provedor, f"{campo} de {ticker} indisponível")
+                cache_mercado.guardar(chave_mercado(ticker, campo, parametros=parametros), BUSCA_FALHOU, TTL_FALHA)
+    return pd.Series([valores.get(t) for t in tickers], index=tickers, dtype=float)
+
+
+# Função para obter preço atual e preço alvo de toda a carteira de uma só vez
+@etapa
+def obter_cotacoes_carteira(tickers):
+    tickers = _normalizar_tickers(tickers)
+    cotacoes = pd.DataFrame(index=pd.Index(tickers, name="Ticker"), columns=COLUNAS_COTACAO, dtype=float)
+    if not tickers:
+        return cotacoes
+
+    cotacoes["Preço Atual"] = _obter_campo(tickers, "preco", _buscar_fechamentos, TTL_COTACAO)
+    cotacoes["Preço Alvo"] = _obter_campo(tickers, "preco_alvo", _buscar_precos_alvo, TTL_COTACAO)
+    return cotacoes
+
+
+# Função para ler preço atual e preço alvo de um ticker no DataFrame de cotações
+def preco_e_alvo(cotacoes, ticker):
+    if ticker not in cotacoes.index:
+        return None, None
+    price = cotacoes.at[ticker, "Preço Atual"]
+    target = cotacoes.at[ticker, "Preço Alvo"]
+    return (None if pd.isna(price) else float(price)), (None if pd.isna(target) else float(target))
+
+
+# Função para obter preço atual e preço alvo do Yahoo Finance
+@etapa
+def get_target_price_yfinance(ticker):
+    return preco_e_alvo(obter_cotacoes_carteira([ticker]), ticker)
+
+
+# Função para obter o retorno médio em anos similares de vários tickers de uma só vez
+@etapa
+def analise_historica_carteira(tickers, anos_semelhantes):
+    tickers = _normalizar_tickers(tickers)
+    parametros = tuple(int(ano) for ano in anos_semelhantes)
+
+    def buscar(faltando):
+        try:
+            painel = carregar_painel_compartilhado(faltando, parametros)
+            medias = retornos_anos_similares(painel, parametros)[COLUNA_MEDIA]
+            return {t: (None if pd.isna(m) else float(m)) for t, m in medias.items()}
+        except Exception as e:
+            print(f"Erro ao calcular retorno histórico da carteira: {e}")
+            return {}
+
+    return _obter_campo(tickers, "retorno_anos_similares", buscar, parametros=parametros)
+
+
+# Função para ler o retorno médio de um ticker na Series de retornos da carteira
+def retorno_de(retornos, ticker):
+    media = retornos.get(ticker)
+    return None if media is None or pd.isna(media) else float(media)
+
+
+# Análise de desempenho histórico durante anos semelhantes ao cenário atual
+@etapa
+def analise_historica_anos_similares(ticker, anos_semelhantes):
+    return retorno_de(analise_historica_carteira([ticker], anos_semelhantes), ticker)
+
+
+# Função para buscar os dados de mercado da carteira ticker a ticker, entregando cada um assim
+# que chega (os fechamentos vêm antes, em um único download). Gera (ticker, cotações, retornos,
+# índice de setores) só daquele ticker, no formato das funções de carteira; os valores ficam
+# nos mesmos caches, então a montagem final da carteira inteira não busca nada de novo.
+def dados_em_fluxo(tickers, anos_semelhantes):
+    tickers = _normalizar_tickers(tickers)
+    if not tickers:
+        return
+    _obter_campo(tickers, "preco", _buscar_fechamentos, TTL_COTACAO)
+
+    def buscar(ticker):
+        return (
+            ticker, obter_cotacoes_carteira([ticker]), analise_historica_carteira([ticker], anos_semelhantes),
+            indice_setores([ticker]),
+        )
+
+    pool = ThreadPoolExecutor(max_workers=min(THREADS_FLUXO, len(tickers)), thread_name_prefix="fluxo")
+    try:
+        # Cada busca roda em uma cópia do contexto (orçamento da página, rastreamento)
+        futuros = [pool.submit(contextvars.copy_context().run, buscar, ticker) for ticker in tickers]
+        for futuro in as_completed(futuros):
+            yield futuro.result()
+    finally:
+        # Se quem consome parar no meio, as buscas que nem começaram são canceladas
+        pool.shutdown(wait=False, cancel_futures=True)
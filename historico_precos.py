@@ -0,0 +1,215 @@
+import contextlib
+import datetime
+import sqlite3
+
+import pandas as pd
+import yfinance as yf
+
+from agendador import agendador
+from chamadas import chamar, erro_temporario, prazo
+from configuracao import caminho_dados
+from rastreamento import registrar_cache, registrar_chamada
+
+ARQUIVO_HISTORICO = "historico_precos.sqlite"
+DATA_INICIAL = "2017-01-01"
+
+# Quantidade máxima de tickers por consulta (limite de parâmetros do SQLite)
+TAMANHO_LOTE_CONSULTA = 500
+
+
+# Função para abrir o banco local de históricos, criando as tabelas se necessário
+@contextlib.contextmanager
+def _conectar():
+    conn = sqlite3.connect(caminho_dados(ARQUIVO_HISTORICO), timeout=30)
+    try:
+        with conn:
+            _criar_tabelas(conn)
+            yield conn
+    finally:
+        conn.close()
+
+
+def _criar_tabelas(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS precos ("
+        "ticker TEXT NOT NULL, data TEXT NOT NULL, fechamento REAL, "
+        "PRIMARY KEY (ticker, data))"
+    )
+    # Data da última consulta à rede por ticker, para não repetir a busca no mesmo dia
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS atualizacoes (ticker TEXT PRIMARY KEY, verificado_em TEXT NOT NULL)"
+    )
+    # Eventos corporativos (dividendos, desdobramentos) já refletidos nos fechamentos ajustados
+    # de cada ticker e quando o histórico foi regravado por inteiro
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS ajustes (ticker TEXT PRIMARY KEY, ultimo_evento TEXT, regravado_em TEXT NOT NULL)"
+    )
+    # Preços alvo dos analistas consultados (um valor por ticker e dia), para o backtest
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS precos_alvo ("
+        "ticker TEXT NOT NULL, data TEXT NOT NULL, preco_alvo REAL, "
+        "PRIMARY KEY (ticker, data))"
+    )
+
+
+# Função para buscar no Yahoo Finance os fechamentos ajustados (com os eventos corporativos) a partir de `inicio`
+def _buscar_historico(ticker, inicio, fim):
+    historico = yf.Ticker(ticker).history
+    hist = chamar("yahoo", historico, start=inicio, end=fim, actions=True, timeout=prazo("yahoo"))
+    registrar_chamada("yahoo")
+    eventos = hist.reindex(columns=["Dividends", "Stock Splits"]).fillna(0)
+    datas_eventos = hist.index[(eventos != 0).any(axis=1).to_numpy()]
+    return hist["Close"].dropna(), (datas_eventos.max().strftime("%Y-%m-%d") if len(datas_eventos) else None)
+
+
+# Função para buscar no Yahoo Finance apenas os pregões posteriores ao último armazenado.
+# Os fechamentos vêm ajustados por dividendos e desdobramentos até a data da busca: se o trecho
+# novo trouxer um evento ainda não refletido, os pregões antigos ficaram defasados e o histórico
+# inteiro do ticker é buscado e regravado (sem isso, a emenda viraria um salto falso de preço).
+def atualizar_historico(ticker):
+    hoje = datetime.date.today()
+    with _conectar() as conn:
+        verificado = conn.execute(
+            "SELECT verificado_em FROM atualizacoes WHERE ticker = ?", (ticker,)
+        ).fetchone()
+        if verificado and verificado[0] >= hoje.isoformat():
+            registrar_cache("historico_precos", acertos=1)
+            return
+        registrar_cache("historico_precos", falhas=1)
+
+        ultima = conn.execute("SELECT MAX(data) FROM precos WHERE ticker = ?", (ticker,)).fetchone()[0]
+        inicio = (
+            (datetime.date.fromisoformat(ultima) + datetime.timedelta(days=1)).isoformat()
+            if ultima else DATA_INICIAL
+        )
+
+        # A busca inclui o pregão de hoje só para ver seus eventos (uma data-ex hoje já ajusta os
+        # anteriores); apenas pregões encerrados são gravados, para não guardar barras parciais
+        if inicio < hoje.isoformat():
+            amanha = (hoje + datetime.timedelta(days=1)).isoformat()
+            try:
+                hist, evento = _buscar_historico(ticker, inicio, amanha)
+                ajuste = conn.execute("SELECT ultimo_evento FROM ajustes WHERE ticker = ?", (ticker,)).fetchone()
+                regravar = ultima is not None and evento is not None and (ajuste is None or evento > (ajuste[0] or ""))
+                if regravar:
+                    hist, evento = _buscar_historico(ticker, DATA_INICIAL, amanha)
+            except Exception as e:
+                registrar_chamada("yahoo", erro=True)
+                print(f"Erro ao atualizar histórico de {ticker}: {e}")
+                if erro_temporario(e):
+                    return
+                # Erro definitivo (ex.: ticker inexistente): fica verificado hoje, sem pregões novos
+                hist, evento, regravar = pd.Series(dtype=float, index=pd.DatetimeIndex([])), None, False
+
+            hist = hist[hist.index.strftime("%Y-%m-%d") < hoje.isoformat()]
+            if regravar:
+                conn.execute("DELETE FROM precos WHERE ticker = ?", (ticker,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO precos (ticker, data, fechamento) VALUES (?, ?, ?)",
+                [(ticker, data.strftime("%Y-%m-%d"), float(valor)) for data, valor in hist.items()],
+            )
+            if ultima is None or regravar:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ajustes (ticker, ultimo_evento, regravado_em) VALUES (?, ?, ?)",
+                    (ticker, evento, datetime.datetime.now().isoformat(timespec="seconds")),
+                )
+
+        conn.execute(
+            "INSERT OR REPLACE INTO atualizacoes (ticker, verificado_em) VALUES (?, ?)",
+            (ticker, hoje.isoformat()),
+        )
+
+
+# Função para ler do disco um painel de fechamentos (datas × tickers), opcionalmente só de alguns
+# anos e/ou a partir de uma data (ISO)
+def carregar_painel(tickers, anos=None, atualizar=True, desde=None):
+    tickers = list(dict.fromkeys(tickers))
+    if atualizar:
+        agendador.mapear("yahoo", atualizar_historico, tickers)
+
+    filtro_anos = ""
+    parametros_anos = []
+    if anos is not None:
+        parametros_anos = [str(int(ano)) for ano in anos]
+        if not parametros_anos:
+            return pd.DataFrame(columns=tickers, dtype=float)
+        filtro_anos = f" AND substr(data, 1, 4) IN ({', '.join('?' * len(parametros_anos))})"
+    if desde is not None:
+        filtro_anos += " AND data >= ?"
+        parametros_anos.append(desde)
+
+    linhas = []
+    with _conectar() as conn:
+        for inicio in range(0, len(tickers), TAMANHO_LOTE_CONSULTA):
+            lote = tickers[inicio:inicio + TAMANHO_LOTE_CONSULTA]
+            consulta = (
+                f"SELECT data, ticker, fechamento FROM precos "
+                f"WHERE ticker IN ({', '.join('?' * len(lote))}){filtro_anos}"
+            )
+            linhas.extend(conn.execute(consulta, lote + parametros_anos).fetchall())
+
+    dados = pd.DataFrame(linhas, columns=["data", "ticker", "fechamento"])
+    painel = dados.pivot(index="data", columns="ticker", values="fechamento")
+    painel.index = pd.to_datetime(painel.index)
+    painel.index.name = None
+    painel.columns.name = None
+    return painel.sort_index().reindex(columns=tickers).astype(float)
+
+
+# Função para ler do disco os fechamentos de um ticker, opcionalmente só de alguns anos
+def carregar_fechamentos(ticker, anos=None):
+    return carregar_painel([ticker], anos)[ticker].dropna().rename("Close")
+
+
+# Função para listar os tickers com histórico armazenado
+def tickers_armazenados():
+    with _conectar() as conn:
+        return [linha[0] for linha in conn.execute("SELECT DISTINCT ticker FROM precos ORDER BY ticker").fetchall()]
+
+
+# Função para listar os tickers cujo histórico foi regravado por inteiro desde uma data (ISO)
+def tickers_regravados(desde):
+    with _conectar() as conn:
+        return [linha[0] for linha in conn.execute("SELECT ticker FROM ajustes WHERE regravado_em >= ?", (desde,))]
+
+
+# Função para apagar o histórico armazenado (de um ticker ou de todos), forçando nova busca completa
+def limpar_historico(ticker=None):
+    with _conectar() as conn:
+        if ticker is None:
+            conn.execute("DELETE FROM precos")
+            conn.execute("DELETE FROM atualizacoes")
+            conn.execute("DELETE FROM ajustes")
+        else:
+            conn.execute("DELETE FROM precos WHERE ticker = ?", (ticker,))
+            conn.execute("DELETE FROM atualizacoes WHERE ticker = ?", (ticker,))
+            conn.execute("DELETE FROM ajustes WHERE ticker = ?", (ticker,))
+
+
+# Função para arquivar os preços alvo consultados (dicionário ticker -> preço alvo)
+def arquivar_precos_alvo(alvos, data=None):
+    data = (data or datetime.date.today()).isoformat()
+    linhas = [(ticker, data, float(alvo)) for ticker, alvo in alvos.items() if alvo is not None and not pd.isna(alvo)]
+    if not linhas:
+        return 0
+    with _conectar() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO precos_alvo (ticker, data, preco_alvo) VALUES (?, ?, ?)", linhas
+        )
+    return len(linhas)
+
+
+# Função para ler o arquivo de preços alvo como painel (datas × tickers)
+def carregar_precos_alvo(tickers=None):
+    with _conectar() as conn:
+        linhas = conn.execute("SELECT data, ticker, preco_alvo FROM precos_alvo").fetchall()
+    dados = pd.DataFrame(linhas, columns=["data", "ticker", "preco_alvo"])
+    if tickers is not None:
+        dados = dados[dados["ticker"].isin(list(tickers))]
+    painel = dados.pivot(index="data", columns="ticker", values="preco_alvo")
+    painel.index = pd.to_datetime(painel.index)
+    painel.index.name = None
+    painel.columns.name = None
+    painel = painel.sort_index()
+    return painel.reindex(columns=list(dict.fromkeys(tickers))) if tickers is not None else painel
@@ -0,0 +1,40 @@
+import threading
+from collections import defaultdict
+
+import yfinance as yf
+
+from cache_mercado import TTL_COTACAO, cache_mercado, chave_mercado
+from chamadas import chamar, erro_temporario
+from rastreamento import registrar_chamada
+
+# Campos do .info usados pelo preço alvo (dados_mercado) e pelo índice de setores (setores)
+CAMPOS_INFO = ("targetMeanPrice", "sector", "industry")
+
+# Um lock por ticker: buscas simultâneas do mesmo ticker esperam a primeira em vez de repetir a consulta
+_locks = defaultdict(threading.Lock)
+_lock = threading.Lock()
+
+
+# Função para buscar o .info de um ticker uma única vez para todos os usos. Devolve
+# (concluída, campos): um ticker inexistente conclui sem campos (e fica no cache como os
+# demais); só falhas temporárias não são guardadas, para nova busca.
+def buscar_info(ticker):
+    chave = chave_mercado(ticker, "info")
+    with _lock:
+        lock_ticker = _locks[ticker]
+    with lock_ticker:
+        encontrado, campos = cache_mercado.obter(chave)
+        if encontrado:
+            return True, campos
+        try:
+            info = chamar("yahoo", lambda: yf.Ticker(ticker).info)
+            registrar_chamada("yahoo")
+            campos = {campo: info.get(campo) for campo in CAMPOS_INFO}
+        except Exception as e:
+            registrar_chamada("yahoo", erro=True)
+            print(f"Erro ao buscar dados de {ticker} no Yahoo: {e}")
+            if erro_temporario(e):
+                return False, {}
+            campos = {}
+        cache_mercado.guardar(chave, campos, TTL_COTACAO)
+        return True, campos
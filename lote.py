@@ -0,0 +1,108 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from alocacao import ajustar_alocacao
+from dados_mercado import analise_historica_carteira, obter_cotacoes_carteira
+from pipeline import parametros_cenario, pipeline
+from rastreamento import rastrear_execucao
+from setores import indice_setores
+
+
+# Função para ler as carteiras (CSV com colunas Ticker, Peso (%)) de um diretório
+def carregar_carteiras(diretorio):
+    carteiras = {}
+    for caminho in sorted(glob.glob(os.path.join(diretorio, "*.csv"))):
+        try:
+            carteira = pd.read_csv(caminho)
+            carteiras[os.path.splitext(os.path.basename(caminho))[0]] = carteira[["Ticker", "Peso (%)"]]
+        except Exception as e:
+            print(f"Erro ao ler a carteira {caminho}: {e}")
+    return carteiras
+
+
+# Função para calcular o cenário macroeconômico uma única vez para todas as carteiras
+def calcular_cenario(api_key, cenario):
+    resultados = pipeline.executar(parametros_cenario(api_key, cenario), ["analise_cenario", "anos_similares"])
+    _, setores_bull, setores_bear = resultados["analise_cenario"]
+    return setores_bull, setores_bear, resultados["anos_similares"]
+
+
+# Função executada em cada processo: pontua uma carteira com os dados de mercado já carregados
+def _pontuar(nome, carteira, setores_bull, setores_bear, anos_similares, cotacoes, retornos, indice):
+    return nome, ajustar_alocacao(
+        carteira, setores_bull, setores_bear, anos_similares,
+        cotacoes=cotacoes, retornos=retornos, indice=indice,
+    )
+
+
+# Função para gravar o resultado de uma carteira assim que ele fica pronto
+def _gravar(resultado, saida, nome, formato):
+    caminho = os.path.join(saida, f"{nome}_sugestoes.{formato}")
+    if formato == "parquet":
+        resultado.to_parquet(caminho, index=False)
+    else:
+        resultado.to_csv(caminho, index=False)
+    return caminho
+
+
+# Função para analisar todas as carteiras de um diretório sem a interface do Streamlit
+def analisar_carteiras(diretorio, saida, formato="csv", processos=None, api_key=None, cenario="macrov3"):
+    carteiras = carregar_carteiras(diretorio)
+    if not carteiras:
+        print(f"Nenhuma carteira encontrada em {diretorio}.")
+        return []
+    os.makedirs(saida, exist_ok=True)
+
+    setores_bull, setores_bear, anos_similares = calcular_cenario(api_key, cenario)
+    print(f"Setores favorecidos: {', '.join(setores_bull) or '-'}")
+    print(f"Setores com alerta: {', '.join(setores_bear) or '-'}")
+    print(f"Anos similares: {', '.join(map(str, anos_similares))}")
+
+    # Dados de mercado buscados uma única vez para a união dos tickers
+    tickers = list(dict.fromkeys(t for c in carteiras.values() for t in c["Ticker"].astype(str)))
+    cotacoes = obter_cotacoes_carteira(tickers)
+    retornos = analise_historica_carteira(tickers, anos_similares)
+    indice = indice_setores(tickers)
+
+    gravados = []
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        futuros = [
+            pool.submit(
+                _pontuar, nome, carteira, setores_bull, setores_bear, anos_similares,
+                cotacoes.reindex(carteira["Ticker"].astype(str).unique()),
+                retornos.reindex(carteira["Ticker"].astype(str).unique()),
+                {t: indice.get(t, ()) for t in carteira["Ticker"].astype(str)},
+            )
+            for nome, carteira in carteiras.items()
+        ]
+        for futuro in as_completed(futuros):
+            try:
+                nome, resultado = futuro.result()
+                gravados.append(_gravar(resultado, saida, nome, formato))
+                print(f"{nome}: {len(resultado)} ativos -> {gravados[-1]}")
+            except Exception as e:
+                print(f"Erro ao pontuar carteira: {e}")
+    return gravados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sugestão de alocação em lote para um diretório de carteiras (CSV).")
+    parser.add_argument("diretorio", help="diretório com arquivos CSV (colunas: Ticker, Peso (%%))")
+    parser.add_argument("--saida", default="resultados", help="diretório onde gravar as sugestões")
+    parser.add_argument("--formato", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--processos", type=int, default=None, help="quantidade de processos (padrão: nº de CPUs)")
+    parser.add_argument("--cenario", default="macrov3", help="conjunto de regras de regras.json")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    with rastrear_execucao("lote"):
+        gravados = analisar_carteiras(
+            args.diretorio, args.saida, args.formato, args.processos,
+            api_key=os.environ.get("GNEWS_API_KEY"), cenario=args.cenario,
+        )
+    print(f"{len(gravados)} carteiras analisadas em {time.perf_counter() - inicio:.1f}s.")
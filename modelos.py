@@ -0,0 +1,48 @@
+import importlib
+import threading
+import time
+
+# Registro de dependências pesadas (spaCy, VADER), carregadas apenas no
+# primeiro uso e mantidas no processo a partir daí.
+
+_modulos = {}
+_modelos = {}
+_tempos = {}
+_lock = threading.RLock()
+
+
+# Função para importar um módulo sob demanda, registrando o tempo de importação
+def importar(nome_modulo):
+    with _lock:
+        if nome_modulo not in _modulos:
+            inicio = time.perf_counter()
+            _modulos[nome_modulo] = importlib.import_module(nome_modulo)
+            _tempos[("import", nome_modulo)] = time.perf_counter() - inicio
+        return _modulos[nome_modulo]
+
+
+_CARREGADORES = {
+    "spacy_pt": lambda: importar("spacy").load("pt_core_news_sm"),
+    "vader": lambda: importar("vaderSentiment.vaderSentiment").SentimentIntensityAnalyzer(),
+}
+
+
+# Função para obter um modelo do registro, carregando-o na primeira chamada
+def obter_modelo(nome):
+    with _lock:
+        if nome not in _modelos:
+            carregador = _CARREGADORES[nome]
+            inicio = time.perf_counter()
+            _modelos[nome] = carregador()
+            _tempos[("modelo", nome)] = time.perf_counter() - inicio
+        return _modelos[nome]
+
+
+# Função para gerar o relatório de custo de carga por dependência (mais lentas primeiro)
+def relatorio_carga():
+    with _lock:
+        itens = [
+            {"tipo": tipo, "dependencia": nome, "segundos": round(segundos, 4)}
+            for (tipo, nome), segundos in _tempos.items()
+        ]
+    return sorted(itens, key=lambda item: item["segundos"], reverse=True)
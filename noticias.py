@@ -0,0 +1,236 @@
+import contextlib
+import datetime
+import hashlib
+import re
+import sqlite3
+import unicodedata
+
+import pandas as pd
+
+from chamadas import requisitar
+from cliente_http import bytes_transferidos
+from configuracao import caminho_dados
+from rastreamento import etapa, registrar_chamada
+from sentimento import COLUNAS_VADER, analisar_sentimentos
+
+URL_GNEWS = "https://gnews.io/api/v4/search"
+ARQUIVO_NOTICIAS = "noticias.sqlite"
+CONSULTA_PADRAO = "economia brasil"
+POR_PAGINA = 10
+MAX_PAGINAS = 5
+LIMITE_PADRAO = 5
+# Tempo em que as páginas reaproveitam as notícias já buscadas antes de consultar a GNews de novo
+TTL_NOTICIAS = 15 * 60
+# Na primeira ingestão, até onde voltar no tempo ao paginar os resultados
+HISTORICO_INICIAL_DIAS = 7
+
+# Deduplicação de notícias replicadas: similaridade de Jaccard entre shingles de palavras
+TAMANHO_SHINGLE = 3
+LIMIAR_SIMILARIDADE = 0.7
+JANELA_DEDUPLICACAO = 500
+
+COLUNAS_SENTIMENTO = list(COLUNAS_VADER.values())
+
+
+# Função para abrir o arquivo local de notícias, criando a tabela se necessário
+@contextlib.contextmanager
+def _conectar():
+    conn = sqlite3.connect(caminho_dados(ARQUIVO_NOTICIAS), timeout=30)
+    try:
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS noticias ("
+                "id TEXT PRIMARY KEY, titulo TEXT NOT NULL, descricao TEXT, fonte TEXT, url TEXT, "
+                "publicado_em TEXT NOT NULL, ingerido_em TEXT NOT NULL, "
+                + ", ".join(f"{coluna} REAL" for coluna in COLUNAS_SENTIMENTO)
+                + ")"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_noticias_publicado ON noticias (publicado_em)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS lacunas ("
+                "consulta TEXT NOT NULL, desde TEXT NOT NULL, ate TEXT NOT NULL, PRIMARY KEY (consulta, ate))"
+            )
+            yield conn
+    finally:
+        conn.close()
+
+
+# Função para normalizar o texto (minúsculas, sem acentos e sem pontuação)
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9 ]+", " ", texto.lower()).split()
+
+
+# Função para gerar os shingles de palavras de um artigo
+def _shingles(titulo, descricao):
+    palavras = _normalizar(f"{titulo} {descricao}")
+    if len(palavras) < TAMANHO_SHINGLE:
+        return {" ".join(palavras)}
+    return {" ".join(palavras[i:i + TAMANHO_SHINGLE]) for i in range(len(palavras) - TAMANHO_SHINGLE + 1)}
+
+
+def _similaridade(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+# Função para verificar se o artigo é cópia (exata ou quase) de algum já conhecido
+def _duplicado(identificador, shingles, conhecidos):
+    return any(
+        identificador == outro_id or _similaridade(shingles, outros) >= LIMIAR_SIMILARIDADE
+        for outro_id, outros in conhecidos
+    )
+
+
+# Função para buscar uma página de resultados da GNews (das mais recentes para as mais antigas)
+def _buscar_pagina(api_key, consulta, pagina, desde, ate=None):
+    parametros = {
+        "q": consulta, "lang": "pt", "country": "br", "max": POR_PAGINA,
+        "page": pagina, "sortby": "publishedAt", "token": api_key,
+    }
+    if desde:
+        parametros["from"] = desde
+    if ate:
+        parametros["to"] = ate
+    response = requisitar("gnews", URL_GNEWS, params=parametros)
+    registrar_chamada("gnews", bytes_transferidos(response))
+    data = response.json()
+    if "errors" in data:
+        raise RuntimeError(data["errors"])
+    return data.get("articles", [])
+
+
+# Função para paginar a janela (desde, ate) até esgotá-la ou acabar o limite de páginas.
+# Devolve as novas notícias, a data da mais antiga recebida, se a janela foi esgotada
+# e quantas páginas foram usadas
+def _paginar(api_key, consulta, desde, ate, max_paginas, conhecidos, agora):
+    novas, mais_antiga = [], None
+    for pagina in range(1, max_paginas + 1):
+        try:
+            artigos = _buscar_pagina(api_key, consulta, pagina, desde, ate)
+        except Exception as e:
+            print(f"Erro ao buscar notícias: {e}")
+            return novas, mais_antiga, False, pagina
+
+        for artigo in artigos:
+            publicado_em = artigo.get("publishedAt") or agora
+            if (desde and publicado_em <= desde) or (ate and publicado_em > ate):
+                continue
+            mais_antiga = min(mais_antiga or publicado_em, publicado_em)
+            titulo = artigo.get("title") or ""
+            descricao = artigo.get("description") or ""
+            identificador = hashlib.sha1(" ".join(_normalizar(titulo)).encode("utf-8")).hexdigest()
+            shingles = _shingles(titulo, descricao)
+            if _duplicado(identificador, shingles, conhecidos):
+                continue
+            conhecidos.append((identificador, shingles))
+            novas.append((
+                identificador, titulo, descricao, (artigo.get("source") or {}).get("name"),
+                artigo.get("url"), publicado_em, agora,
+            ))
+
+        if len(artigos) < POR_PAGINA:
+            return novas, mais_antiga, True, pagina
+    return novas, mais_antiga, False, max_paginas
+
+
+# Função para ingerir as notícias publicadas depois da última armazenada, descartando
+# cópias de notícias replicadas. Quando a paginação é interrompida (limite de páginas
+# ou erro), o trecho entre a última armazenada e a mais antiga recebida fica registrado
+# como lacuna e é preenchido, das mais recentes para as mais antigas, nas próximas
+# ingestões com as páginas que sobrarem
+def ingerir_noticias(api_key, consulta=CONSULTA_PADRAO, max_paginas=MAX_PAGINAS):
+    agora = datetime.datetime.now(datetime.timezone.utc)
+    with _conectar() as conn:
+        ultima = conn.execute("SELECT MAX(publicado_em) FROM noticias").fetchone()[0]
+        lacunas = conn.execute(
+            "SELECT desde, ate FROM lacunas WHERE consulta = ? ORDER BY ate DESC", (consulta,)
+        ).fetchall()
+        recentes = conn.execute(
+            "SELECT id, titulo, descricao FROM noticias ORDER BY publicado_em DESC LIMIT ?",
+            (JANELA_DEDUPLICACAO,),
+        ).fetchall()
+    conhecidos = [(identificador, _shingles(titulo, descricao)) for identificador, titulo, descricao in recentes]
+    inicio = ultima or (agora - datetime.timedelta(days=HISTORICO_INICIAL_DIAS)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    agora = agora.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    novas, abertas, fechadas = [], [], []
+    restantes = max_paginas
+    for desde, ate in [(inicio, None)] + lacunas:
+        if restantes <= 0:
+            break
+        recebidas, mais_antiga, esgotada, usadas = _paginar(api_key, consulta, desde, ate, restantes, conhecidos, agora)
+        restantes -= usadas
+        novas.extend(recebidas)
+        if ate is not None and (esgotada or mais_antiga):
+            fechadas.append((consulta, ate))
+        if not esgotada and mais_antiga:
+            abertas.append((consulta, desde, mais_antiga))
+        if not esgotada:
+            break
+
+    with _conectar() as conn:
+        conn.executemany("DELETE FROM lacunas WHERE consulta = ? AND ate = ?", fechadas)
+        conn.executemany("INSERT OR REPLACE INTO lacunas (consulta, desde, ate) VALUES (?, ?, ?)", abertas)
+        conn.executemany(
+            "INSERT OR IGNORE INTO noticias "
+            "(id, titulo, descricao, fonte, url, publicado_em, ingerido_em) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            novas,
+        )
+    return len(novas)
+
+
+# Função para calcular o sentimento apenas das notícias ainda não pontuadas
+def pontuar_pendentes():
+    with _conectar() as conn:
+        pendentes = conn.execute(
+            "SELECT id, titulo FROM noticias WHERE sentimento_completo IS NULL"
+        ).fetchall()
+    if not pendentes:
+        return 0
+
+    identificadores, titulos = zip(*pendentes)
+    sentimentos = analisar_sentimentos(titulos)
+    atualizacoes = [
+        tuple(float(v) for v in valores) + (identificador,)
+        for identificador, valores in zip(identificadores, sentimentos[COLUNAS_SENTIMENTO].to_numpy())
+    ]
+    with _conectar() as conn:
+        conn.executemany(
+            f"UPDATE noticias SET {', '.join(f'{c} = ?' for c in COLUNAS_SENTIMENTO)} WHERE id = ?",
+            atualizacoes,
+        )
+    return len(atualizacoes)
+
+
+# Função para ler as notícias arquivadas, das mais recentes para as mais antigas
+def carregar_noticias(limite=None, desde=None):
+    consulta = "SELECT * FROM noticias"
+    parametros = []
+    if desde:
+        consulta += " WHERE publicado_em > ?"
+        parametros.append(desde)
+    consulta += " ORDER BY publicado_em DESC"
+    if limite:
+        consulta += " LIMIT ?"
+        parametros.append(int(limite))
+    with _conectar() as conn:
+        return pd.read_sql_query(consulta, conn, params=parametros)
+
+
+# Função para obter o sentimento das notícias mais recentes, pontuando só as novas
+def sentimentos_recentes(limite=LIMITE_PADRAO):
+    pontuar_pendentes()
+    noticias = carregar_noticias(limite)
+    return noticias.rename(columns={"titulo": "noticia"})[["noticia"] + COLUNAS_SENTIMENTO]
+
+
+# Função para buscar as notícias (ingere as novas e devolve os títulos mais recentes)
+@etapa
+def noticias_reais(api_key, limite=LIMITE_PADRAO):
+    ingerir_noticias(api_key)
+    try:
+        return carregar_noticias(limite)["titulo"].tolist()
+    except Exception as e:
+        print(f"Erro ao ler notícias arquivadas: {e}")
+        return []
@@ -0,0 +1,155 @@
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+
+from precos_compartilhados import carregar_painel_compartilhado
+
+METODOS = {
+    "minima_variancia": "Mínima variância",
+    "paridade_risco": "Paridade de risco",
+    "media_variancia": "Média-variância com os sinais do cenário",
+}
+# Pregões usados na estimativa da covariância e mínimo de retornos por ticker
+JANELA_DIAS = 504
+MINIMO_OBSERVACOES = 60
+DIAS_POR_ANO = 252
+# Média-variância: aversão a risco e retorno anual atribuído a cada sinal (aumentar/reduzir)
+AVERSAO_RISCO = 5.0
+INTENSIDADE_VISOES = 0.05
+MAX_ITERACOES = 1000
+TOLERANCIA = 1e-7
+
+# Última solução de cada método (pesos por ticker), ponto de partida da próxima otimização
+_solucoes = {}
+_lock = threading.Lock()
+
+
+# Função para estimar a covariância anualizada com encolhimento de Ledoit-Wolf em direção
+# a um múltiplo da identidade. Recebe retornos (datas × tickers); faltas contam como a média.
+def covariancia_encolhida(retornos):
+    valores = retornos.to_numpy(dtype=float)
+    n = len(valores)
+    centrados = np.nan_to_num(valores - np.nanmean(valores, axis=0))
+    amostral = centrados.T @ centrados / n
+    p = amostral.shape[0]
+
+    mu = np.trace(amostral) / p
+    alvo = mu * np.eye(p)
+    distancia = np.sum((amostral - alvo) ** 2) / p
+    # Variância da estimativa amostral: soma_k ||x_k x_k' - S||² = soma_k ||x_k||⁴ - n ||S||²
+    normas = np.einsum("ij,ij->i", centrados, centrados)
+    dispersao = (np.sum(normas ** 2) - n * np.sum(amostral ** 2)) / (n ** 2 * p)
+    intensidade = 0.0 if distancia <= 0 else float(np.clip(dispersao / distancia, 0, 1))
+
+    encolhida = intensidade * alvo + (1 - intensidade) * amostral
+    return pd.DataFrame(encolhida * DIAS_POR_ANO, index=retornos.columns, columns=retornos.columns), intensidade
+
+
+# Função para calcular a covariância dos tickers a partir do histórico local de preços.
+# Tickers com histórico insuficiente ficam de fora da matriz.
+def covariancia_carteira(tickers):
+    tickers = list(dict.fromkeys(tickers))
+    ano = datetime.date.today().year
+    painel = carregar_painel_compartilhado(tickers, anos=range(ano - 2, ano + 1))
+    retornos = painel.pct_change(fill_method=None).iloc[1:].tail(JANELA_DIAS)
+    suficientes = retornos.columns[retornos.notna().sum() >= MINIMO_OBSERVACOES]
+    if len(suficientes) == 0:
+        return pd.DataFrame(dtype=float)
+    covariancia, _ = covariancia_encolhida(retornos[suficientes])
+    return covariancia
+
+
+# Função para projetar um vetor no conjunto {soma = 1, 0 <= w <= limite} (bisseção no deslocamento)
+def _projetar(v, limite):
+    limite = max(limite, 1 / len(v))
+    baixo, alto = v.min() - limite, v.max()
+    for _ in range(60):
+        meio = (baixo + alto) / 2
+        if np.clip(v - meio, 0, limite).sum() > 1:
+            baixo = meio
+        else:
+            alto = meio
+    return np.clip(v - alto, 0, limite)
+
+
+# Função para estimar o maior autovalor (constante de Lipschitz do gradiente) por iteração de potência
+def _maior_autovalor(matriz, iteracoes=30):
+    v = np.ones(matriz.shape[0]) / np.sqrt(matriz.shape[0])
+    autovalor = 0.0
+    for _ in range(iteracoes):
+        w = matriz @ v
+        autovalor = float(np.linalg.norm(w))
+        if autovalor == 0:
+            return 0.0
+        v = w / autovalor
+    return autovalor
+
+
+# Função para minimizar ½ w'Aw - b'w no conjunto de pesos (gradiente projetado acelerado)
+def _minimizar_quadratica(a, b, inicial, limite):
+    passo = 1 / max(_maior_autovalor(a), 1e-12)
+    w = _projetar(inicial, limite)
+    y, t = w, 1.0
+    for _ in range(MAX_ITERACOES):
+        novo = _projetar(y - passo * (a @ y - b), limite)
+        if np.max(np.abs(novo - w)) < TOLERANCIA:
+            return novo
+        t_novo = (1 + np.sqrt(1 + 4 * t * t)) / 2
+        y = novo + ((t - 1) / t_novo) * (novo - w)
+        w, t = novo, t_novo
+    return w
+
+
+# Função para obter pesos com contribuições de risco iguais (descida coordenada de Spinu:
+# minimiza ½ y'Σy - Σ log(y)/n e normaliza y)
+def _paridade_risco(covariancia, inicial):
+    n = covariancia.shape[0]
+    orcamento = 1 / n
+    diagonal = np.diag(covariancia)
+    y = inicial / np.sqrt(max(inicial @ covariancia @ inicial, 1e-12))
+    sigma_y = covariancia @ y
+    for _ in range(MAX_ITERACOES):
+        anterior = y.copy()
+        for i in range(n):
+            resto = sigma_y[i] - diagonal[i] * y[i]
+            novo = (-resto + np.sqrt(resto * resto + 4 * diagonal[i] * orcamento)) / (2 * diagonal[i])
+            sigma_y += covariancia[:, i] * (novo - y[i])
+            y[i] = novo
+        if np.max(np.abs(y - anterior)) < TOLERANCIA * max(1.0, np.max(np.abs(y))):
+            break
+    return y / y.sum()
+
+
+# Função para otimizar os pesos (somando 1) dos tickers da matriz de covariância.
+# `visoes` (-1, 0 ou 1 por ticker) são os sinais de reduzir/aumentar usados na média-variância.
+# A otimização parte da solução anterior do mesmo método (tickers novos entram com peso igual).
+def otimizar_pesos(covariancia, metodo, visoes=None, limite=1.0):
+    if metodo not in METODOS:
+        raise ValueError(f"Método de otimização desconhecido: {metodo}")
+    tickers = list(covariancia.index)
+    if not tickers:
+        return pd.Series(dtype=float)
+    matriz = covariancia.to_numpy(dtype=float)
+
+    with _lock:
+        anterior = _solucoes.get(metodo)
+    inicial = np.full(len(tickers), 1 / len(tickers))
+    if anterior is not None:
+        inicial = anterior.reindex(tickers).fillna(1 / len(tickers)).to_numpy(dtype=float)
+        inicial = np.maximum(inicial, 1e-6)
+        inicial = inicial / inicial.sum()
+
+    if metodo == "paridade_risco":
+        pesos = _projetar(_paridade_risco(matriz, inicial), limite)
+    elif metodo == "minima_variancia":
+        pesos = _minimizar_quadratica(matriz, np.zeros(len(tickers)), inicial, limite)
+    else:
+        sinais = np.zeros(len(tickers)) if visoes is None else visoes.reindex(tickers).fillna(0).to_numpy(dtype=float)
+        pesos = _minimizar_quadratica(AVERSAO_RISCO * matriz, INTENSIDADE_VISOES * sinais, inicial, limite)
+
+    solucao = pd.Series(pesos, index=tickers)
+    with _lock:
+        _solucoes[metodo] = solucao
+    return solucao
@@ -0,0 +1,538 @@
+import contextlib
+import datetime
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from alocacao import (
+    ajustar_alocacao, ajustar_alocacao_otimizada, ajustar_alocacao_por_upside, empresas_destaque,
+    empresas_em_oportunidade,
+)
+from bcb import ComparadorRegimes, painel_mensal
+from cache_mercado import TTL_COTACAO
+from chamadas import monitorar_falhas
+from configuracao import caminho_dados
+from dados_mercado import analise_historica_carteira, obter_cotacoes_carteira
+from noticias import TTL_NOTICIAS, noticias_reais, sentimentos_recentes
+from otimizacao import covariancia_carteira
+from rastreamento import registrar_cache
+from regras import extrair_topicos, setores_do_cenario
+from setores import indice_setores
+
+# Anos usados quando não é possível calcular os anos similares com os dados do BCB
+ANOS_SIMILARES_PADRAO = [2019, 2022]
+# Quantidade de resultados guardados por etapa (entradas diferentes, ex.: carteiras de várias sessões)
+RESULTADOS_POR_ETAPA = 32
+# Parâmetros que só marcam o vencimento dos dados (não mudam o que é pedido)
+JANELAS_TEMPO = ("janela_noticias", "janela_cotacoes", "dia")
+# Quantidade de resultados completos guardados para servir enquanto a versão nova é calculada
+RETRATOS_GUARDADOS = 64
+# Arquivo onde os retratos sobrevivem a reinícios e deploys
+ARQUIVO_RETRATOS = "retratos_pipeline.sqlite"
+# Parâmetros que não são gravados em disco (a chave volta de quem pede ou do aquecedor)
+PARAMETROS_SECRETOS = ("api_key",)
+
+
+# Função para acumular no hash o conteúdo de um valor (DataFrames, Series, arrays e objetos simples)
+def _atualizar_hash(h, valor):
+    h.update(type(valor).__name__.encode("utf-8"))
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        rotulos = list(valor.columns) if isinstance(valor, pd.DataFrame) else [valor.name]
+        try:
+            h.update(pickle.dumps((rotulos, [str(tipo) for tipo in np.atleast_1d(valor.dtypes)])))
+            h.update(pd.util.hash_pandas_object(valor, index=True).to_numpy().tobytes())
+            return
+        except TypeError:
+            # Colunas com valores não hasheáveis (listas, dicionários)
+            h.update(pickle.dumps(valor))
+            return
+    if isinstance(valor, np.ndarray):
+        h.update(f"{valor.dtype}{valor.shape}".encode("utf-8"))
+        h.update(np.ascontiguousarray(valor).tobytes())
+    elif isinstance(valor, (list, tuple)):
+        h.update(str(len(valor)).encode("utf-8"))
+        for item in valor:
+            _atualizar_hash(h, item)
+    elif isinstance(valor, dict):
+        h.update(str(len(valor)).encode("utf-8"))
+        for chave, item in sorted(valor.items(), key=lambda par: repr(par[0])):
+            _atualizar_hash(h, chave)
+            _atualizar_hash(h, item)
+    else:
+        h.update(pickle.dumps(valor))
+
+
+# Função para calcular o hash do conteúdo de um valor
+def hash_conteudo(valor):
+    h = hashlib.sha1()
+    _atualizar_hash(h, valor)
+    return h.hexdigest()
+
+
+# Etapa do pipeline: nome, função e nomes das entradas (parâmetros ou resultados de outras etapas)
+class Etapa:
+    def __init__(self, nome, funcao, entradas=()):
+        self.nome = nome
+        self.funcao = funcao
+        self.entradas = tuple(entradas)
+
+
+# Função para abrir o armazenamento dos retratos do pipeline
+@contextlib.contextmanager
+def _conectar(arquivo):
+    conn = sqlite3.connect(caminho_dados(arquivo), timeout=30)
+    try:
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS retratos ("
+                "identidade TEXT PRIMARY KEY, pedido BLOB NOT NULL, valores BLOB NOT NULL, "
+                "momento REAL, guardado_em REAL NOT NULL)"
+            )
+            yield conn
+    finally:
+        conn.close()
+
+
+# Função para separar os parâmetros gravados em disco: chaves não nulas ficam de fora
+def _sem_secretos(parametros):
+    return {k: v for k, v in parametros.items() if k not in PARAMETROS_SECRETOS or v is None}
+
+
+# Pipeline de etapas com dependências declaradas. Cada resultado é guardado pelo hash do
+# conteúdo das suas entradas, e o hash do próprio resultado alimenta as etapas seguintes:
+# uma etapa só é recalculada quando alguma entrada mudou de fato, e uma etapa recalculada
+# que produz o mesmo conteúdo não força o recálculo das que dependem dela.
+# O último resultado completo de cada pedido (parâmetros sem as janelas de tempo) fica
+# guardado como "retrato", servido de imediato enquanto a versão nova é calculada. Com
+# `arquivo_retratos`, os retratos também vão para o disco e valem depois de reiniciar o processo.
+class Pipeline:
+    def __init__(self, etapas, capacidade=RESULTADOS_POR_ETAPA, arquivo_retratos=None):
+        self.capacidade = capacidade
+        self.arquivo_retratos = arquivo_retratos
+        self.etapas = OrderedDict()
+        self._resultados = {}
+        self._retratos = OrderedDict()
+        self._revalidando = set()
+        self._lock = threading.RLock()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="revalidacao")
+        for etapa in etapas:
+            self.adicionar(etapa)
+
+    # Registra uma etapa (os nomes são únicos)
+    def adicionar(self, etapa):
+        if etapa.nome in self.etapas:
+            raise ValueError(f"Etapa duplicada no pipeline: {etapa.nome}")
+        self.etapas[etapa.nome] = etapa
+
+    # Ordem de execução (topológica) das etapas necessárias para os alvos.
+    # Nomes informados como parâmetros substituem a etapa de mesmo nome.
+    def _ordem(self, alvos, parametros):
+        ordem = []
+        visitando = set()
+
+        def visitar(nome):
+            if nome in parametros or nome in ordem:
+                return
+            if nome not in self.etapas:
+                raise KeyError(f"Entrada desconhecida no pipeline: {nome}")
+            if nome in visitando:
+                raise ValueError(f"Dependência circular no pipeline: {nome}")
+            visitando.add(nome)
+            for entrada in self.etapas[nome].entradas:
+                visitar(entrada)
+            visitando.discard(nome)
+            ordem.append(nome)
+
+        for alvo in alvos:
+            visitar(alvo)
+        return ordem
+
+    # Executa as etapas necessárias para os alvos. Devolve os valores (nome -> resultado,
+    # incluindo os parâmetros) e o momento dos dados de cada etapa: o da busca mais antiga que
+    # a alimenta (etapas com janela de tempo entre as entradas), e se alguma etapa saiu incompleta
+    # (alguma busca externa desistiu). Com `calcular=False`, só lê os resultados guardados e
+    # devolve None se faltar algum.
+    def _executar(self, parametros, alvos, calcular=True):
+        valores = dict(parametros)
+        hashes = {nome: hash_conteudo(valor) for nome, valor in parametros.items()}
+        momentos = {}
+        incompleto = False
+
+        for nome in self._ordem(alvos, parametros):
+            etapa = self.etapas[nome]
+            chave = tuple(hashes[entrada] for entrada in etapa.entradas)
+            with self._lock:
+                guardados = self._resultados.setdefault(nome, OrderedDict())
+                item = guardados.get(chave)
+                if item is not None:
+                    guardados.move_to_end(chave)
+
+            if item is None:
+                if not calcular:
+                    return None
+                registrar_cache("pipeline", falhas=1)
+                with monitorar_falhas() as falhas:
+                    resultado = etapa.funcao(*(valores[entrada] for entrada in etapa.entradas))
+                item = (resultado, hash_conteudo(resultado), time.time())
+                # Resultado incompleto (alguma busca externa desistiu) não é guardado:
+                # a próxima execução serve o retrato e tenta de novo em segundo plano
+                incompleto = incompleto or bool(falhas)
+                if not falhas:
+                    with self._lock:
+                        guardados[chave] = item
+                        while len(guardados) > self.capacidade:
+                            guardados.popitem(last=False)
+            else:
+                registrar_cache("pipeline", acertos=1)
+            valores[nome], hashes[nome], criado_em = item
+            anteriores = [momentos[entrada] for entrada in etapa.entradas if momentos.get(entrada) is not None]
+            if any(entrada in JANELAS_TEMPO for entrada in etapa.entradas):
+                anteriores.append(criado_em)
+            momentos[nome] = min(anteriores, default=None)
+        return valores, momentos, incompleto
+
+    # Executa as etapas necessárias para os alvos (todas, se não informados) e devolve
+    # um dicionário nome -> resultado, incluindo os parâmetros. Um resultado incompleto não
+    # substitui o retrato: o último resultado bom (e o seu momento) continua sendo servido.
+    def executar(self, parametros, alvos=None):
+        alvos = list(self.etapas) if alvos is None else list(alvos)
+        valores, momentos, incompleto = self._executar(parametros, alvos)
+        if not incompleto:
+            self._guardar_retrato(parametros, alvos, valores, momentos)
+        return valores
+
+    # Executa sem esperar pelas fontes externas quando já existe um retrato do mesmo pedido:
+    # devolve o retrato e recalcula em segundo plano. Devolve (valores, momento dos dados,
+    # atualizando); o momento é o da busca mais antiga usada pelos alvos (None se não houver).
+    # Com `calcular=False`, devolve None em vez de calcular quando não há resultado nem retrato
+    # (quem chama pode então exibir os dados à medida que chegam).
+    def executar_sem_espera(self, parametros, alvos=None, calcular=True):
+        alvos = list(self.etapas) if alvos is None else list(alvos)
+        atual = self._executar(parametros, alvos, calcular=False)
+        if atual is not None:
+            valores, momentos, _ = atual
+            self._guardar_retrato(parametros, alvos, valores, momentos)
+            return valores, _momento_alvos(momentos, alvos), False
+
+        identidade = _identidade(parametros, alvos)
+        retrato = self._retrato(identidade, parametros)
+        if retrato is None:
+            if not calcular:
+                return None
+            valores, momentos, incompleto = self._executar(parametros, alvos)
+            if not incompleto:
+                self._guardar_retrato(parametros, alvos, valores, momentos)
+            return valores, _momento_alvos(momentos, alvos), False
+        self._revalidar(identidade, parametros, alvos)
+        return retrato[2], retrato[3], True
+
+    # Guarda o resultado completo de um pedido como retrato (na memória e, se mudou, no disco)
+    def _guardar_retrato(self, parametros, alvos, valores, momentos):
+        identidade = _identidade(parametros, alvos)
+        retrato = (dict(parametros), alvos, valores, _momento_alvos(momentos, alvos))
+        with self._lock:
+            anterior = self._retratos.get(identidade)
+            self._lembrar_retrato(identidade, retrato)
+        # Resultados lidos do pipeline são os mesmos objetos: sem mudança, não há o que gravar
+        if self.arquivo_retratos is None or (
+            anterior is not None and all(anterior[2].get(alvo) is valores[alvo] for alvo in alvos)
+        ):
+            return
+        try:
+            pedido = pickle.dumps((_sem_secretos(parametros), alvos))
+            conteudo = pickle.dumps(_sem_secretos({**parametros, **{alvo: valores[alvo] for alvo in alvos}}))
+            with _conectar(self.arquivo_retratos) as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO retratos (identidade, pedido, valores, momento, guardado_em) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (identidade, pedido, conteudo, retrato[3], time.time()),
+                )
+                conn.execute(
+                    "DELETE FROM retratos WHERE identidade NOT IN "
+                    "(SELECT identidade FROM retratos ORDER BY guardado_em DESC LIMIT ?)",
+                    (RETRATOS_GUARDADOS,),
+                )
+        except Exception as e:
+            print(f"Erro ao gravar retrato do pipeline: {e}")
+
+    def _lembrar_retrato(self, identidade, retrato):
+        self._retratos[identidade] = retrato
+        self._retratos.move_to_end(identidade)
+        while len(self._retratos) > RETRATOS_GUARDADOS:
+            self._retratos.popitem(last=False)
+
+    # Retrato de um pedido: da memória ou, depois de um reinício, do disco (com os parâmetros
+    # secretos de quem pede)
+    def _retrato(self, identidade, parametros):
+        with self._lock:
+            retrato = self._retratos.get(identidade)
+        if retrato is not None or self.arquivo_retratos is None:
+            return retrato
+        try:
+            with _conectar(self.arquivo_retratos) as conn:
+                linha = conn.execute(
+                    "SELECT pedido, valores, momento FROM retratos WHERE identidade = ?", (identidade,)
+                ).fetchone()
+            if linha is None:
+                return None
+            (guardados, alvos), valores = pickle.loads(linha[0]), pickle.loads(linha[1])
+        except Exception as e:
+            print(f"Erro ao ler retrato do pipeline: {e}")
+            return None
+        secretos = {k: parametros[k] for k in PARAMETROS_SECRETOS if k in parametros}
+        retrato = ({**guardados, **secretos}, alvos, {**valores, **secretos}, linha[2])
+        with self._lock:
+            self._lembrar_retrato(identidade, retrato)
+        return retrato
+
+    # Pedidos dos retratos gravados em disco (os mais recentes primeiro)
+    def _pedidos_guardados(self):
+        if self.arquivo_retratos is None:
+            return []
+        try:
+            with _conectar(self.arquivo_retratos) as conn:
+                linhas = conn.execute(
+                    "SELECT pedido FROM retratos ORDER BY guardado_em DESC LIMIT ?", (RETRATOS_GUARDADOS,)
+                ).fetchall()
+            return [pickle.loads(linha[0]) for linha in linhas]
+        except Exception as e:
+            print(f"Erro ao ler retratos do pipeline: {e}")
+            return []
+
+    # Agenda o recálculo de um pedido em segundo plano (um por pedido de cada vez)
+    def _revalidar(self, identidade, parametros, alvos):
+        with self._lock:
+            if identidade in self._revalidando:
+                return
+            self._revalidando.add(identidade)
+
+        def revalidar():
+            try:
+                self.executar(parametros, alvos)
+            except Exception as e:
+                print(f"Erro ao atualizar dados em segundo plano: {e}")
+            finally:
+                with self._lock:
+                    self._revalidando.discard(identidade)
+
+        self._pool.submit(revalidar)
+
+    # Recalcula com as janelas de tempo atuais os pedidos informados e os recentes, da memória e do
+    # disco (aquecimento dos caches). Pedidos gravados recebem os parâmetros secretos informados;
+    # sem eles, ficam de fora. Devolve a quantidade de pedidos atualizados.
+    def aquecer(self, agora=None, pedidos=(), secretos=None):
+        with self._lock:
+            recentes = [(parametros, alvos) for parametros, alvos, _, _ in self._retratos.values()]
+        guardados = [({**(secretos or {}), **parametros}, alvos) for parametros, alvos in self._pedidos_guardados()]
+        unicos = {}
+        for parametros, alvos in list(pedidos) + recentes + guardados:
+            if all(k in parametros for k in PARAMETROS_SECRETOS):
+                unicos.setdefault(_identidade(parametros, alvos), (parametros, alvos))
+        atualizados = 0
+        for parametros, alvos in unicos.values():
+            try:
+                self.executar({**parametros, **janelas_tempo(agora)}, alvos)
+                atualizados += 1
+            except Exception as e:
+                print(f"Erro ao aquecer o pipeline: {e}")
+        return atualizados
+
+    # Descarta os resultados guardados de uma etapa (ou de todas, junto com os retratos)
+    def limpar(self, nome=None):
+        with self._lock:
+            if nome is None:
+                self._resultados.clear()
+                self._retratos.clear()
+            else:
+                self._resultados.pop(nome, None)
+        if nome is None and self.arquivo_retratos is not None:
+            with _conectar(self.arquivo_retratos) as conn:
+                conn.execute("DELETE FROM retratos")
+
+
+# Função para identificar um pedido: parâmetros sem as janelas de tempo e alvos
+def _identidade(parametros, alvos):
+    return hash_conteudo(({k: v for k, v in parametros.items() if k not in JANELAS_TEMPO}, list(alvos)))
+
+
+# Função para obter o momento dos dados dos alvos (a busca mais antiga entre eles)
+def _momento_alvos(momentos, alvos):
+    return min((momentos[alvo] for alvo in alvos if momentos.get(alvo) is not None), default=None)
+
+
+# Função para calcular as janelas de tempo: mudam quando vencem os prazos de notícias e
+# cotações e na virada do dia, forçando nova busca
+def janelas_tempo(agora=None):
+    agora = time.time() if agora is None else agora
+    return {
+        "janela_noticias": int(agora // TTL_NOTICIAS),
+        "janela_cotacoes": int(agora // TTL_COTACAO),
+        "dia": datetime.date.fromtimestamp(agora).isoformat(),
+    }
+
+
+# Função para montar os parâmetros de uma execução do pipeline de cenário (com as janelas de tempo).
+# `metodo` escolhe um otimizador de otimizacao.METODOS no lugar das regras de alocação.
+def parametros_cenario(api_key, cenario, carteira=None, anos_similares=None, agora=None, metodo=None):
+    parametros = {"api_key": api_key, "cenario": cenario, **janelas_tempo(agora), "metodo": metodo}
+    if carteira is not None:
+        parametros["carteira"] = carteira
+    if anos_similares is not None:
+        parametros["anos_similares"] = [int(ano) for ano in anos_similares]
+    return parametros
+
+
+# Carteira exibida por padrão nas páginas de alocação (também aquecida sem visita)
+CARTEIRA_PADRAO = [
+    {"Ticker": "AGRO3.SA", "Peso (%)": 10},
+    {"Ticker": "BBAS3.SA", "Peso (%)": 1.2},
+    {"Ticker": "BBSE3.SA", "Peso (%)": 6.5},
+    {"Ticker": "BPAC11.SA", "Peso (%)": 10.6},
+    {"Ticker": "EGIE3.SA", "Peso (%)": 5},
+    {"Ticker": "ITUB3.SA", "Peso (%)": 0.5},
+    {"Ticker": "PRIO3.SA", "Peso (%)": 15},
+    {"Ticker": "PSSA3.SA", "Peso (%)": 15},
+    {"Ticker": "SAPR3.SA", "Peso (%)": 6.7},
+    {"Ticker": "SBSP3.SA", "Peso (%)": 4},
+    {"Ticker": "VIVT3.SA", "Peso (%)": 6.4},
+    {"Ticker": "WEGE3.SA", "Peso (%)": 15},
+    {"Ticker": "TOTS3.SA", "Peso (%)": 1},
+    {"Ticker": "B3SA3.SA", "Peso (%)": 0.1},
+    {"Ticker": "TAEE3.SA", "Peso (%)": 3},
+]
+# Alvos pedidos por cada página
+ALVOS_MACRO = ["noticias", "sentimentos", "topicos"]
+ALVOS_MACROV2 = ["analise_cenario", "sugestoes_upside", "destaques"]
+ALVOS_MACROV3 = ["analise_cenario", "sugestoes", "oportunidades"]
+
+
+# Função para montar os pedidos padrão das páginas (sem carteira enviada pelo usuário), que o
+# aquecedor calcula mesmo antes da primeira visita
+def pedidos_padrao(api_key, agora=None):
+    carteira = pd.DataFrame(CARTEIRA_PADRAO)
+    return [
+        (parametros_cenario(api_key, None, agora=agora), ALVOS_MACRO),
+        (parametros_cenario(None, None, agora=agora), ["anos_similares"]),
+        (parametros_cenario(api_key, "macrov2", carteira, ANOS_SIMILARES_PADRAO, agora), ALVOS_MACROV2),
+        (parametros_cenario(api_key, "macrov3", carteira, ANOS_SIMILARES_PADRAO, agora), ALVOS_MACROV3),
+    ]
+
+
+# Função da etapa de notícias (sem chave da GNews, o cenário é montado sem notícias)
+def buscar_noticias(api_key, janela_noticias):
+    return noticias_reais(api_key) if api_key else []
+
+
+# Função da etapa de sentimento das notícias exibidas
+def calcular_sentimentos(noticias):
+    return sentimentos_recentes(len(noticias)) if noticias else pd.DataFrame()
+
+
+# Função para analisar o cenário com base nas notícias: resumo em lista e setores favorecidos/em alerta
+def analisar_cenario_com_noticias(noticias, cenario):
+    resumo = "\n".join([f"- {n}" for n in noticias])
+    setores_favoraveis, setores_alerta = setores_do_cenario(noticias, cenario)
+    return resumo, setores_favoraveis, setores_alerta
+
+
+# Função da etapa do painel mensal do BCB (atualizado uma vez por dia)
+def montar_painel_economico(dia):
+    return painel_mensal()
+
+
+# Função da etapa de anos similares ao cenário atual
+def calcular_anos_similares(painel):
+    try:
+        return ComparadorRegimes(painel).anos_similares(2) or ANOS_SIMILARES_PADRAO
+    except Exception as e:
+        print(f"Erro ao calcular anos similares: {e}")
+        return ANOS_SIMILARES_PADRAO
+
+
+# Tickers da carteira, sem repetição: alterar apenas pesos não muda esta etapa
+def tickers_da_carteira(carteira):
+    return list(dict.fromkeys(carteira["Ticker"].astype(str)))
+
+
+# Funções das etapas de dados de mercado; as janelas de tempo só entram na chave do resultado
+def buscar_cotacoes(tickers, janela_cotacoes):
+    return obter_cotacoes_carteira(tickers)
+
+
+def buscar_retornos(tickers, anos_similares, dia):
+    return analise_historica_carteira(tickers, anos_similares)
+
+
+def buscar_indice_setores(tickers, dia):
+    return indice_setores(tickers)
+
+
+# Só os otimizadores usam a covariância; trocar de um método para outro não a recalcula
+def usa_covariancia(metodo):
+    return metodo is not None
+
+
+def calcular_covariancia(tickers, dia, usa_covariancia):
+    return covariancia_carteira(tickers) if usa_covariancia else None
+
+
+# Funções das etapas de alocação, a partir dos dados de mercado já carregados
+def calcular_sugestoes(carteira, analise_cenario, anos_similares, cotacoes, retornos, indice, metodo, covariancia):
+    _, setores_bull, setores_bear = analise_cenario
+    if metodo is not None:
+        return ajustar_alocacao_otimizada(
+            carteira, setores_bull, setores_bear, anos_similares, metodo,
+            cotacoes=cotacoes, retornos=retornos, indice=indice, covariancia=covariancia,
+        )
+    return ajustar_alocacao(
+        carteira, setores_bull, setores_bear, anos_similares, cotacoes=cotacoes, retornos=retornos, indice=indice,
+    )
+
+
+def calcular_destaques(carteira, analise_cenario, anos_similares, cotacoes, retornos, indice):
+    _, setores_bull, setores_bear = analise_cenario
+    return empresas_destaque(
+        carteira, setores_bull, setores_bear, anos_similares, cotacoes=cotacoes, retornos=retornos, indice=indice,
+    )
+
+
+# Definição única do fluxo notícias -> cenário -> dados de mercado -> alocação, usada pelas três páginas
+ETAPAS_CENARIO = [
+    Etapa("noticias", buscar_noticias, ["api_key", "janela_noticias"]),
+    Etapa("sentimentos", calcular_sentimentos, ["noticias"]),
+    Etapa("topicos", extrair_topicos, ["noticias"]),
+    Etapa("analise_cenario", analisar_cenario_com_noticias, ["noticias", "cenario"]),
+    Etapa("painel_economico", montar_painel_economico, ["dia"]),
+    Etapa("anos_similares", calcular_anos_similares, ["painel_economico"]),
+    Etapa("tickers", tickers_da_carteira, ["carteira"]),
+    Etapa("cotacoes", buscar_cotacoes, ["tickers", "janela_cotacoes"]),
+    Etapa("retornos", buscar_retornos, ["tickers", "anos_similares", "dia"]),
+    Etapa("indice_setores", buscar_indice_setores, ["tickers", "dia"]),
+    Etapa("usa_covariancia", usa_covariancia, ["metodo"]),
+    Etapa("covariancia", calcular_covariancia, ["tickers", "dia", "usa_covariancia"]),
+    Etapa(
+        "sugestoes", calcular_sugestoes,
+        [
+            "carteira", "analise_cenario", "anos_similares", "cotacoes", "retornos", "indice_setores",
+            "metodo", "covariancia",
+        ],
+    ),
+    Etapa("sugestoes_upside", ajustar_alocacao_por_upside, ["carteira", "cotacoes"]),
+    Etapa(
+        "destaques", calcular_destaques,
+        ["carteira", "analise_cenario", "anos_similares", "cotacoes", "retornos", "indice_setores"],
+    ),
+    Etapa("oportunidades", empresas_em_oportunidade, ["sugestoes"]),
+]
+
+# Instância única por processo: os resultados são endereçados pelo conteúdo das entradas,
+# então podem ser compartilhados entre as sessões do Streamlit (e os retratos, entre processos)
+pipeline = Pipeline(ETAPAS_CENARIO, arquivo_retratos=ARQUIVO_RETRATOS)
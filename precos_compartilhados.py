@@ -0,0 +1,200 @@
+import argparse
+import datetime
+import glob
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from agendador import agendador
+from configuracao import caminho_dados
+from historico_precos import atualizar_historico, carregar_painel, tickers_armazenados, tickers_regravados
+from rastreamento import rastrear_execucao, registrar_cache
+
+# Arquivo que aponta para a versão atual do mapa de preços (tickers, datas e matriz de fechamentos)
+ARQUIVO_PONTEIRO = "precos_mapa.json"
+PREFIXO_MATRIZ = "precos_mapa_"
+PREFIXO_DATAS = "precos_datas_"
+# Versões anteriores mantidas no disco para leitores que ainda não trocaram de versão
+VERSOES_MANTIDAS = 2
+# Idade máxima do mapa antes de os leitores voltarem ao histórico em SQLite
+IDADE_MAXIMA_DIAS = 3
+# Tickers copiados por vez da versão anterior para a nova (limita a memória do processo gravador)
+LOTE_COPIA = 256
+
+
+# Mapa de fechamentos em float32 (tickers × datas) num arquivo mapeado em memória.
+# Os arquivos de cada versão nunca mudam depois de publicados: todos os processos leem as mesmas
+# páginas do cache do sistema operacional, sem cópia por sessão. O gravador publica uma nova
+# versão trocando o ponteiro de forma atômica, e cada leitor remapeia quando o ponteiro muda.
+class PrecosCompartilhados:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._marca = None
+        self._mapa = None
+
+    # Retorna o mapa atual (matriz, datas, posição de cada ticker, data da atualização) ou None
+    def mapa(self):
+        caminho = caminho_dados(ARQUIVO_PONTEIRO)
+        try:
+            estado = os.stat(caminho)
+        except FileNotFoundError:
+            return None
+        marca = (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+        with self._lock:
+            if marca != self._marca:
+                try:
+                    with open(caminho, encoding="utf-8") as arquivo:
+                        ponteiro = json.load(arquivo)
+                    versao = ponteiro["versao"]
+                    self._mapa = (
+                        np.load(caminho_dados(f"{PREFIXO_MATRIZ}{versao}.npy"), mmap_mode="r"),
+                        pd.DatetimeIndex(np.load(caminho_dados(f"{PREFIXO_DATAS}{versao}.npy"))),
+                        {ticker: i for i, ticker in enumerate(ponteiro["tickers"])},
+                        ponteiro["atualizado_em"],
+                    )
+                    self._marca = marca
+                except Exception as e:
+                    print(f"Erro ao abrir o mapa de preços: {e}")
+                    return None
+            return self._mapa
+
+    # Painel (datas × tickers) dos tickers presentes no mapa, opcionalmente só de alguns anos.
+    # Devolve também os tickers ausentes (ou todos, se o mapa estiver vencido).
+    def painel(self, tickers, anos=None):
+        tickers = list(dict.fromkeys(tickers))
+        mapa = self.mapa()
+        limite = (datetime.date.today() - datetime.timedelta(days=IDADE_MAXIMA_DIAS)).isoformat()
+        if mapa is None or mapa[3] < limite:
+            return pd.DataFrame(dtype=float), tickers
+        matriz, datas, posicoes, _ = mapa
+
+        presentes = [t for t in tickers if t in posicoes]
+        faltando = [t for t in tickers if t not in posicoes]
+        registrar_cache("precos_compartilhados", acertos=len(presentes), falhas=len(faltando))
+        if anos is None:
+            inicio, fim = 0, len(datas)
+        else:
+            anos = sorted(int(ano) for ano in anos)
+            if not anos:
+                return pd.DataFrame(columns=presentes, dtype=float), faltando
+            inicio = datas.searchsorted(pd.Timestamp(anos[0], 1, 1))
+            fim = datas.searchsorted(pd.Timestamp(anos[-1] + 1, 1, 1))
+
+        # Só o recorte pedido sai do mapa (as linhas ficam contíguas no arquivo, uma por ticker)
+        recorte = matriz[[posicoes[t] for t in presentes], inicio:fim].T.astype(float)
+        painel = pd.DataFrame(recorte, index=datas[inicio:fim], columns=presentes)
+        if anos is not None:
+            painel = painel.loc[painel.index.year.isin(anos)]
+        return painel.dropna(how="all"), faltando
+
+
+# Função para ler um painel de fechamentos do mapa compartilhado, completando com o histórico
+# em SQLite (e a rede) apenas os tickers ausentes do mapa
+def carregar_painel_compartilhado(tickers, anos=None):
+    tickers = list(dict.fromkeys(tickers))
+    painel, faltando = precos_compartilhados.painel(tickers, anos)
+    if faltando:
+        complemento = carregar_painel(faltando, anos)
+        painel = complemento if painel.empty else painel.join(complemento, how="outer")
+    return painel.sort_index().reindex(columns=tickers).astype(float)
+
+
+# Função para gravar um array .npy e publicar o ponteiro para a nova versão (troca atômica)
+def _publicar(versao, tickers, datas, atualizado_em):
+    np.save(caminho_dados(f"{PREFIXO_DATAS}{versao}.npy"), datas.to_numpy(dtype="datetime64[D]"))
+    temporario = caminho_dados(f"{ARQUIVO_PONTEIRO}.{versao}")
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump({"versao": versao, "tickers": tickers, "atualizado_em": atualizado_em}, arquivo)
+    os.replace(temporario, caminho_dados(ARQUIVO_PONTEIRO))
+
+    # Remove versões antigas (leitores que ainda as mapeiam continuam válidos até remapear)
+    versoes = sorted(
+        os.path.basename(caminho)[len(PREFIXO_MATRIZ):-len(".npy")]
+        for caminho in glob.glob(caminho_dados(f"{PREFIXO_MATRIZ}*.npy"))
+    )
+    for antiga in versoes[:-VERSOES_MANTIDAS]:
+        for prefixo in (PREFIXO_MATRIZ, PREFIXO_DATAS):
+            try:
+                os.remove(caminho_dados(f"{prefixo}{antiga}.npy"))
+            except OSError:
+                pass
+
+
+# Função do processo gravador: acrescenta ao mapa os pregões novos (e os tickers novos) do
+# histórico em SQLite e publica uma nova versão. Com `completo`, reconstrói o mapa do zero.
+def exportar_precos(tickers=None, atualizar=True, completo=False):
+    atual = None if completo else precos_compartilhados.mapa()
+    anteriores = [] if atual is None else list(atual[2])
+    tickers = list(dict.fromkeys(anteriores + list(tickers or tickers_armazenados())))
+    if atualizar:
+        agendador.mapear("yahoo", atualizar_historico, tickers)
+
+    mantidos, novos = [], list(tickers)
+    recentes = completos = pd.DataFrame(dtype=float)
+    if atual is not None:
+        matriz, datas_antigas, posicoes, atualizado_em = atual
+        # Último pregão com preço de cada ticker: a busca recomeça no mais atrasado deles.
+        # Históricos regravados depois da versão anterior (reajuste por evento corporativo) são relidos inteiros.
+        validos = np.isfinite(matriz)
+        com_dados = validos.any(axis=1)
+        regravados = set(tickers_regravados(atualizado_em))
+        mantidos = [t for t in anteriores if com_dados[posicoes[t]] and t not in regravados]
+        novos = [t for t in tickers if t not in set(mantidos)]
+        tickers = mantidos + novos
+        if mantidos:
+            ultimos = len(datas_antigas) - 1 - np.argmax(validos[:, ::-1], axis=1)
+            desde = datas_antigas[ultimos[[posicoes[t] for t in mantidos]].min()] + pd.Timedelta(days=1)
+            recentes = carregar_painel(mantidos, atualizar=False, desde=desde.strftime("%Y-%m-%d"))
+    if novos:
+        completos = carregar_painel(novos, atualizar=False)
+
+    indices = [recentes.index, completos.index]
+    if mantidos:
+        indices.append(datas_antigas)
+    datas = pd.DatetimeIndex(sorted(set().union(*indices)))
+    versao = f"{time.time_ns()}_{os.getpid()}"
+    nova = np.lib.format.open_memmap(
+        caminho_dados(f"{PREFIXO_MATRIZ}{versao}.npy"), mode="w+", dtype=np.float32, shape=(len(tickers), len(datas)),
+    )
+    nova[:] = np.nan
+    linha = {ticker: i for i, ticker in enumerate(tickers)}
+
+    # Os tickers mantidos ocupam as primeiras linhas da nova versão, na mesma ordem
+    if mantidos:
+        colunas_antigas = datas.get_indexer(datas_antigas)
+        for inicio in range(0, len(mantidos), LOTE_COPIA):
+            lote = mantidos[inicio:inicio + LOTE_COPIA]
+            nova[inicio:inicio + len(lote), colunas_antigas] = matriz[[posicoes[t] for t in lote]]
+    # Pregões lidos do SQLite; faltas no painel não apagam preços já copiados
+    for painel in (recentes, completos):
+        if not painel.empty:
+            area = np.ix_([linha[t] for t in painel.columns], datas.get_indexer(painel.index))
+            valores = painel.to_numpy(dtype=np.float32).T
+            nova[area] = np.where(np.isfinite(valores), valores, nova[area])
+    nova.flush()
+    del nova
+
+    _publicar(versao, tickers, datas, datetime.date.today().isoformat())
+    return len(tickers), len(datas)
+
+
+# Instância única por processo; os arquivos mapeados são compartilhados entre os processos
+precos_compartilhados = PrecosCompartilhados()
+
+
+# Atualização agendada (ex.: cron após o fechamento): python precos_compartilhados.py [TICKER...]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publica o mapa de preços compartilhado a partir do histórico local.")
+    parser.add_argument("tickers", nargs="*", help="tickers a incluir (padrão: todos com histórico armazenado)")
+    parser.add_argument("--sem-atualizar", action="store_true", help="não busca pregões novos no Yahoo Finance")
+    parser.add_argument("--completo", action="store_true", help="reconstrói o mapa em vez de acrescentar")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    with rastrear_execucao("precos_compartilhados"):
+        quantidade, pregoes = exportar_precos(args.tickers, not args.sem_atualizar, args.completo)
+    print(f"Mapa com {quantidade} tickers e {pregoes} pregões publicado em {time.perf_counter() - inicio:.1f}s.")
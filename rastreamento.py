@@ -0,0 +1,162 @@
+import contextlib
+import contextvars
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from configuracao import caminho_dados
+
+ARQUIVO_RASTREAMENTO = "rastreamento.jsonl"
+# Arquivo JSON lines com uma linha por execução (padrão: dentro do diretório de dados)
+CAMINHO_EXPORTACAO = os.environ.get("MACROHM_RASTREAMENTO")
+
+_execucao_atual = contextvars.ContextVar("execucao_atual", default=None)
+_lock_exportacao = threading.Lock()
+
+
+# Medições de uma execução (um carregamento de página ou uma rodada do lote):
+# tempo e chamadas por etapa, chamadas externas e bytes por provedor, acertos e falhas por cache
+class Execucao:
+    def __init__(self, nome):
+        self.nome = nome
+        self.id = uuid.uuid4().hex
+        self.inicio = datetime.datetime.now(datetime.timezone.utc)
+        self.segundos = None
+        self.etapas = {}
+        self.externas = {}
+        self.caches = {}
+        self._inicio = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def registrar_etapa(self, nome, segundos, erro=False):
+        with self._lock:
+            etapa = self.etapas.setdefault(nome, {"chamadas": 0, "segundos": 0.0, "erros": 0})
+            etapa["chamadas"] += 1
+            etapa["segundos"] += segundos
+            etapa["erros"] += int(erro)
+
+    # Sem tamanho informado (ex.: Yahoo, cujas respostas passam pela sessão interna do yfinance
+    # e não podem ser medidas), os bytes do provedor ficam desconhecidos em vez de somarem 0
+    def registrar_chamada(self, provedor, tamanho=None, erro=False):
+        with self._lock:
+            externa = self.externas.setdefault(provedor, {"chamadas": 0, "bytes": 0, "erros": 0})
+            externa["chamadas"] += 1
+            if tamanho is None or externa["bytes"] is None:
+                externa["bytes"] = None
+            else:
+                externa["bytes"] += tamanho
+            externa["erros"] += int(erro)
+
+    def registrar_cache(self, nome, acertos=0, falhas=0):
+        with self._lock:
+            cache = self.caches.setdefault(nome, {"acertos": 0, "falhas": 0})
+            cache["acertos"] += acertos
+            cache["falhas"] += falhas
+
+    def encerrar(self):
+        self.segundos = time.perf_counter() - self._inicio
+
+    def como_dict(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "nome": self.nome,
+                "inicio": self.inicio.isoformat(),
+                "segundos": self.segundos,
+                "etapas": {nome: dict(valores) for nome, valores in self.etapas.items()},
+                "externas": {nome: dict(valores) for nome, valores in self.externas.items()},
+                "caches": {nome: dict(valores) for nome, valores in self.caches.items()},
+            }
+
+
+# Função para obter a execução em andamento no contexto atual (None fora de uma execução)
+def execucao_atual():
+    return _execucao_atual.get()
+
+
+# Função para iniciar uma execução; as medições seguem para as threads do agendador
+def iniciar_execucao(nome):
+    execucao = Execucao(nome)
+    _execucao_atual.set(execucao)
+    return execucao
+
+
+# Função para encerrar uma execução e gravar sua linha no arquivo de exportação
+def finalizar_execucao(execucao, exportar=True):
+    execucao.encerrar()
+    if _execucao_atual.get() is execucao:
+        _execucao_atual.set(None)
+    if exportar:
+        exportar_execucao(execucao)
+    return execucao
+
+
+# Execução delimitada por um bloco with
+@contextlib.contextmanager
+def rastrear_execucao(nome, exportar=True):
+    execucao = iniciar_execucao(nome)
+    try:
+        yield execucao
+    finally:
+        finalizar_execucao(execucao, exportar)
+
+
+# Função para acrescentar a execução ao arquivo JSON lines de monitoramento
+def exportar_execucao(execucao, caminho=None):
+    caminho = caminho or CAMINHO_EXPORTACAO or caminho_dados(ARQUIVO_RASTREAMENTO)
+    try:
+        linha = json.dumps(execucao.como_dict(), ensure_ascii=False)
+        with _lock_exportacao, open(caminho, "a", encoding="utf-8") as arquivo:
+            arquivo.write(linha + "\n")
+    except Exception as e:
+        print(f"Erro ao exportar rastreamento: {e}")
+
+
+# Decorador para medir tempo e chamadas de uma etapa (sem custo fora de uma execução)
+def etapa(funcao):
+    @functools.wraps(funcao)
+    def medida(*args, **kwargs):
+        execucao = _execucao_atual.get()
+        if execucao is None:
+            return funcao(*args, **kwargs)
+        inicio = time.perf_counter()
+        erro = False
+        try:
+            return funcao(*args, **kwargs)
+        except Exception:
+            erro = True
+            raise
+        finally:
+            execucao.registrar_etapa(funcao.__name__, time.perf_counter() - inicio, erro)
+    return medida
+
+
+# Função para registrar uma chamada a um provedor externo (tamanho em bytes, quando conhecido)
+def registrar_chamada(provedor, tamanho=None, erro=False):
+    execucao = _execucao_atual.get()
+    if execucao is not None:
+        execucao.registrar_chamada(provedor, tamanho, erro)
+
+
+# Função para registrar acertos e falhas de um cache ou armazenamento local
+def registrar_cache(nome, acertos=0, falhas=0):
+    execucao = _execucao_atual.get()
+    if execucao is not None:
+        execucao.registrar_cache(nome, acertos, falhas)
+
+
+# Função para montar as tabelas (etapas, chamadas externas, caches) exibidas no painel
+def tabelas_execucao(execucao):
+    dados = execucao.como_dict()
+    etapas = pd.DataFrame.from_dict(dados["etapas"], orient="index", columns=["chamadas", "segundos", "erros"])
+    externas = pd.DataFrame.from_dict(dados["externas"], orient="index", columns=["chamadas", "bytes", "erros"])
+    caches = pd.DataFrame.from_dict(dados["caches"], orient="index", columns=["acertos", "falhas"])
+    total = caches["acertos"] + caches["falhas"]
+    caches["taxa_acerto"] = (caches["acertos"] / total.where(total > 0)).round(3)
+    return etapas.sort_values("segundos", ascending=False), externas, caches
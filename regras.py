@@ -0,0 +1,93 @@
+import functools
+import json
+import os
+import re
+
+import pandas as pd
+
+from rastreamento import etapa
+
+ARQUIVO_REGRAS = os.environ.get(
+    "MACROHM_REGRAS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "regras.json")
+)
+
+
+# Marcador de palavras-chave compilado em uma única expressão regular.
+# Cada regra tem uma lista de "palavras" e as marcações (tópico, setores) que aplica.
+# A expressão usa lookahead para encontrar palavras em todas as posições do texto; como
+# as alternativas vêm da mais longa para a mais curta, cada palavra encontrada também
+# aplica as regras das palavras contidas nela, reproduzindo a busca por substring.
+class MarcadorPalavras:
+    def __init__(self, regras):
+        self.regras = list(regras)
+        indices = {}
+        for i, regra in enumerate(self.regras):
+            for palavra in regra.get("palavras", []):
+                indices.setdefault(palavra.lower(), set()).add(i)
+
+        self._regras_por_palavra = {
+            palavra: frozenset().union(*(idx for outra, idx in indices.items() if outra in palavra))
+            for palavra in indices
+        }
+        ordenadas = sorted(indices, key=len, reverse=True)
+        self._padrao = (
+            re.compile("(?=(" + "|".join(map(re.escape, ordenadas)) + "))", re.IGNORECASE)
+            if ordenadas else None
+        )
+
+    # Devolve os índices (ordenados) das regras acionadas pelo texto
+    def marcar(self, texto):
+        if self._padrao is None:
+            return []
+        acionadas = set()
+        for encontrado in self._padrao.finditer(texto):
+            acionadas |= self._regras_por_palavra.get(encontrado.group(1).lower(), frozenset())
+        return sorted(acionadas)
+
+
+# Função para ler a tabela de regras do arquivo de configuração
+@functools.lru_cache(maxsize=None)
+def carregar_regras(caminho=ARQUIVO_REGRAS):
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+# Função para compilar (uma única vez) o marcador de tópicos + setores de um cenário
+@functools.lru_cache(maxsize=None)
+def _marcador(cenario, caminho=ARQUIVO_REGRAS):
+    regras = carregar_regras(caminho)
+    return MarcadorPalavras(regras["topicos"] + (regras["cenarios"][cenario] if cenario else []))
+
+
+# Função para marcar cada texto com tópicos e setores favorecidos/em alerta em uma única passada
+def marcar_textos(textos, cenario=None, caminho=ARQUIVO_REGRAS):
+    marcador = _marcador(cenario, caminho)
+    linhas = []
+    for texto in textos:
+        regras = [marcador.regras[i] for i in marcador.marcar(texto)]
+        linhas.append({
+            "texto": texto,
+            "topicos": [r["topico"] for r in regras if "topico" in r],
+            "favoraveis": [s for r in regras for s in r.get("favoraveis", [])],
+            "alerta": [s for r in regras for s in r.get("alerta", [])],
+        })
+    return pd.DataFrame(linhas, columns=["texto", "topicos", "favoraveis", "alerta"])
+
+
+# Função para extrair tópicos de interesse das notícias
+def extrair_topicos(noticias, caminho=ARQUIVO_REGRAS):
+    resumo = {regra["topico"]: [] for regra in carregar_regras(caminho)["topicos"]}
+    marcacoes = marcar_textos(noticias, caminho=caminho)
+    for noticia, topicos in zip(marcacoes["texto"], marcacoes["topicos"]):
+        for topico in topicos:
+            resumo[topico].append(noticia)
+    return resumo
+
+
+# Função para obter os setores favorecidos e em alerta de um cenário (sem repetição)
+@etapa
+def setores_do_cenario(noticias, cenario, caminho=ARQUIVO_REGRAS):
+    marcacoes = marcar_textos(noticias, cenario, caminho)
+    favoraveis = list(dict.fromkeys(s for lista in marcacoes["favoraveis"] for s in lista))
+    alerta = list(dict.fromkeys(s for lista in marcacoes["alerta"] for s in lista))
+    return favoraveis, alerta
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from modelos import obter_modelo
+from rastreamento import etapa
+
+TAMANHO_LOTE_PADRAO = 256
+
+COLUNAS_VADER = {
+    "neg": "sentimento_negativo",
+    "neu": "sentimento_neutro",
+    "pos": "sentimento_positivo",
+    "compound": "sentimento_completo",
+}
+
+
+# Função para extrair as entidades de cada texto com spaCy, processando em lotes (nlp.pipe)
+def extrair_entidades(textos, tamanho_lote=TAMANHO_LOTE_PADRAO, processos=1):
+    nlp = obter_modelo("spacy_pt")
+    # Apenas o reconhecimento de entidades é necessário aqui
+    desativados = [nome for nome in nlp.pipe_names if nome not in ("tok2vec", "ner")]
+    return [
+        ", ".join(ent.text for ent in doc.ents)
+        for doc in nlp.pipe(textos, batch_size=tamanho_lote, n_process=processos, disable=desativados)
+    ]
+
+
+# Função para realizar análise de sentimento em lote, devolvendo um DataFrame colunar
+@etapa
+def analisar_sentimentos(noticias, tamanho_lote=TAMANHO_LOTE_PADRAO, processos=1, entidades=False):
+    textos = [str(noticia) for noticia in noticias]
+    analyzer = obter_modelo("vader")
+
+    valores = np.empty((len(textos), len(COLUNAS_VADER)), dtype=float)
+    for i, texto in enumerate(textos):
+        sentimento = analyzer.polarity_scores(texto)
+        valores[i] = [sentimento[chave] for chave in COLUNAS_VADER]
+
+    resultado = pd.DataFrame(valores, columns=list(COLUNAS_VADER.values()))
+    resultado.insert(0, "noticia", textos)
+    if entidades:
+        resultado["entidades"] = extrair_entidades(textos, tamanho_lote, processos)
+    return resultado
+
+
+# Função para agregar os sentimentos em indicadores gerais
+def agregar_sentimentos(sentimentos):
+    completo = sentimentos["sentimento_completo"].to_numpy(dtype=float)
+    return {
+        "total": int(completo.size),
+        "soma_completo": float(completo.sum()),
+        "media_completo": float(completo.mean()) if completo.size else 0.0,
+        "positivas": int((completo > 0).sum()),
+        "negativas": int((completo < 0).sum()),
+    }
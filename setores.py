@@ -0,0 +1,141 @@
+import argparse
+import contextlib
+import datetime
+import functools
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+from agendador import agendador
+from configuracao import caminho_dados
+from info_yahoo import buscar_info
+from rastreamento import etapa, registrar_cache
+
+ARQUIVO_INDICE = "setores.sqlite"
+ARQUIVO_MAPA = os.environ.get(
+    "MACROHM_SETORES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "setores.json")
+)
+# Idade máxima dos metadados do Yahoo antes de uma nova consulta
+IDADE_MAXIMA_DIAS = 7
+
+
+# Função para abrir o índice local de setores, criando a tabela se necessário
+@contextlib.contextmanager
+def _conectar():
+    conn = sqlite3.connect(caminho_dados(ARQUIVO_INDICE), timeout=30)
+    try:
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS indice_setores ("
+                "ticker TEXT PRIMARY KEY, setor_yahoo TEXT, industria_yahoo TEXT, atualizado_em TEXT NOT NULL)"
+            )
+            yield conn
+    finally:
+        conn.close()
+
+
+# Função para ler o mapa de setores (Yahoo -> setores das regras) e as exceções por ticker
+@functools.lru_cache(maxsize=None)
+def carregar_mapa(caminho=ARQUIVO_MAPA):
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+
+# Função para buscar setor e indústria de um ticker no Yahoo Finance
+# (a mesma consulta do preço alvo, feita uma só vez por ticker)
+def _buscar_metadados(ticker):
+    concluida, info = buscar_info(ticker)
+    return concluida, info.get("sector"), info.get("industry")
+
+
+# Função para ler do índice apenas as linhas dos tickers pedidos
+def _ler_indice(conn, colunas, tickers):
+    marcadores = ", ".join("?" * len(tickers))
+    return conn.execute(
+        f"SELECT ticker, {colunas} FROM indice_setores WHERE ticker IN ({marcadores})", tickers
+    ).fetchall()
+
+
+# Função para atualizar no índice os tickers ausentes ou com metadados vencidos
+def atualizar_indice(tickers, forcar=False):
+    tickers = list(dict.fromkeys(tickers))
+    limite = (datetime.date.today() - datetime.timedelta(days=IDADE_MAXIMA_DIAS)).isoformat()
+    with _conectar() as conn:
+        atuais = dict(_ler_indice(conn, "atualizado_em", tickers))
+    vencidos = [t for t in tickers if forcar or atuais.get(t, "") < limite]
+    registrar_cache("setores", acertos=len(tickers) - len(vencidos), falhas=len(vencidos))
+    if not vencidos:
+        return 0
+
+    hoje = datetime.date.today().isoformat()
+    resultados = agendador.mapear("yahoo", _buscar_metadados, vencidos)
+    linhas = [
+        (ticker, setor, industria, hoje)
+        for ticker, (sucesso, setor, industria) in zip(vencidos, resultados) if sucesso
+    ]
+    with _conectar() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO indice_setores (ticker, setor_yahoo, industria_yahoo, atualizado_em) "
+            "VALUES (?, ?, ?, ?)",
+            linhas,
+        )
+    return len(linhas)
+
+
+# Função para obter o índice ticker -> setores, para consulta direta por ticker.
+# As exceções do arquivo de mapa substituem a classificação vinda do Yahoo.
+@etapa
+def indice_setores(tickers, atualizar=True):
+    tickers = list(dict.fromkeys(tickers))
+    if atualizar:
+        atualizar_indice(tickers)
+    mapa = carregar_mapa()
+    with _conectar() as conn:
+        metadados = {
+            ticker: (setor, industria)
+            for ticker, setor, industria in _ler_indice(conn, "setor_yahoo, industria_yahoo", tickers)
+        }
+
+    indice = {}
+    for ticker in tickers:
+        if ticker in mapa["tickers"]:
+            indice[ticker] = tuple(mapa["tickers"][ticker])
+            continue
+        setor, industria = metadados.get(ticker, (None, None))
+        setores = mapa["setores_yahoo"].get(setor, []) + mapa["industrias_yahoo"].get(industria, [])
+        indice[ticker] = tuple(dict.fromkeys(setores))
+    return indice
+
+
+# Função para montar a tabela (Ticker, Setor) da carteira, uma linha por setor
+def setores_da_carteira(tickers, indice=None):
+    tickers = list(dict.fromkeys(tickers))
+    indice = indice_setores(tickers) if indice is None else indice
+    pares = [(ticker, setor) for ticker in tickers for setor in indice.get(ticker, ())]
+    return pd.DataFrame(pares, columns=["Ticker", "Setor"])
+
+
+# Função para marcar, alinhado a `tickers`, quais pertencem a algum dos setores informados
+def marcar_setores(tickers, setores, tabela=None):
+    tickers = list(tickers)
+    tabela = setores_da_carteira(tickers) if tabela is None else tabela
+    alvo = pd.DataFrame({"Setor": pd.Series(list(dict.fromkeys(setores)), dtype=object)})
+    encontrados = tabela.merge(alvo, on="Setor")["Ticker"].unique()
+    return pd.Index(tickers).isin(encontrados)
+
+
+# Atualização agendada (ex.: cron): python setores.py TICKER... ou --todos
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Atualiza o índice local de setores a partir do Yahoo Finance.")
+    parser.add_argument("tickers", nargs="*")
+    parser.add_argument("--todos", action="store_true", help="atualiza todos os tickers já indexados")
+    parser.add_argument("--forcar", action="store_true", help="ignora a idade dos metadados")
+    args = parser.parse_args()
+
+    tickers = list(args.tickers)
+    if args.todos:
+        with _conectar() as conn:
+            tickers += [linha[0] for linha in conn.execute("SELECT ticker FROM indice_setores").fetchall()]
+    print(f"{atualizar_indice(tickers, forcar=args.forcar)} tickers atualizados.")
@@ -0,0 +1,88 @@
+import hashlib
+import json
+
+import pytest
+
+import configuracao
+import noticias
+
+
+class _Resposta:
+    def __init__(self, dados):
+        self._dados = dados
+        self.content = json.dumps(dados).encode("utf-8")
+
+    def json(self):
+        return self._dados
+
+
+# Réplica da GNews: ordena por data (mais recentes primeiro) e respeita from, to e page
+class _GNews:
+    def __init__(self):
+        self.artigos = []
+        self.falhar_na_pagina = None
+
+    def publicar(self, quantidade):
+        for _ in range(quantidade):
+            n = len(self.artigos)
+            palavras = hashlib.sha1(str(n).encode()).hexdigest()
+            self.artigos.append({
+                "title": " ".join(palavras[i:i + 6] for i in range(0, 30, 6)),
+                "description": "",
+                "source": {"name": "fonte"},
+                "url": f"https://exemplo/{n}",
+                "publishedAt": f"2030-01-01T{n // 3600:02d}:{n // 60 % 60:02d}:{n % 60:02d}Z",
+            })
+
+    def __call__(self, provedor, url, params=None, **kwargs):
+        pagina = int(params["page"])
+        if pagina == self.falhar_na_pagina:
+            raise ConnectionError("falha simulada")
+        desde, ate = params.get("from"), params.get("to")
+        artigos = sorted(
+            (a for a in self.artigos
+             if (not desde or a["publishedAt"] >= desde) and (not ate or a["publishedAt"] <= ate)),
+            key=lambda a: a["publishedAt"], reverse=True,
+        )
+        por_pagina = int(params["max"])
+        return _Resposta({"articles": artigos[(pagina - 1) * por_pagina:pagina * por_pagina]})
+
+
+@pytest.fixture
+def gnews(tmp_path, monkeypatch):
+    monkeypatch.setattr(configuracao, "DIRETORIO_DADOS", str(tmp_path))
+    replica = _GNews()
+    monkeypatch.setattr(noticias, "requisitar", replica)
+    return replica
+
+
+def _urls_arquivadas():
+    return set(noticias.carregar_noticias()["url"])
+
+
+def test_mais_noticias_que_o_limite_de_paginas_nao_se_perdem(gnews):
+    gnews.publicar(10)
+    assert noticias.ingerir_noticias("chave") == 10
+
+    # 120 novas entre duas ingestões: muito além de MAX_PAGINAS * POR_PAGINA
+    gnews.publicar(120)
+    assert noticias.ingerir_noticias("chave") == noticias.MAX_PAGINAS * noticias.POR_PAGINA
+    while noticias.ingerir_noticias("chave"):
+        pass
+
+    assert _urls_arquivadas() == {a["url"] for a in gnews.artigos}
+
+
+def test_falha_no_meio_da_paginacao_nao_avanca_sem_registrar_a_lacuna(gnews):
+    gnews.publicar(5)
+    noticias.ingerir_noticias("chave")
+
+    gnews.publicar(30)
+    gnews.falhar_na_pagina = 2
+    assert noticias.ingerir_noticias("chave") == noticias.POR_PAGINA
+
+    gnews.falhar_na_pagina = None
+    gnews.publicar(3)
+    noticias.ingerir_noticias("chave")
+
+    assert _urls_arquivadas() == {a["url"] for a in gnews.artigos}
@@ -0,0 +1,165 @@
+import argparse
+import contextlib
+import datetime
+import functools
+import json
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from alocacao import calcular_upside
+from configuracao import caminho_dados
+from dados_mercado import analise_historica_carteira, obter_cotacoes_carteira
+from pipeline import parametros_cenario, pipeline
+from rastreamento import etapa, rastrear_execucao
+from setores import indice_setores
+
+ARQUIVO_SNAPSHOT = "universo.sqlite"
+# Lista de tickers da triagem. Não é a lista completa de papéis da B3: universo.json traz um
+# subconjunto curado de ações líquidas (próximo das carteiras do Ibovespa e do IBrX 100), a ser
+# revisado a cada rebalanceamento trimestral desses índices. Para usar outra lista (ex.: gerada
+# da relação de empresas listadas da B3), aponte MACROHM_UNIVERSO para um JSON {"tickers": [...]}.
+ARQUIVO_UNIVERSO = os.environ.get(
+    "MACROHM_UNIVERSO", os.path.join(os.path.dirname(os.path.abspath(__file__)), "universo.json")
+)
+COLUNAS_SNAPSHOT = ["Ticker", "Preço Atual", "Preço Alvo", "Upside (%)", "Retorno Anos Similares (%)", "Setores"]
+
+
+# Função para abrir o snapshot local do universo, criando as tabelas e índices se necessário
+@contextlib.contextmanager
+def _conectar():
+    conn = sqlite3.connect(caminho_dados(ARQUIVO_SNAPSHOT), timeout=30)
+    try:
+        with conn:
+            _criar_tabelas(conn)
+            yield conn
+    finally:
+        conn.close()
+
+
+def _criar_tabelas(conn):
+    # WAL: o app continua lendo o snapshot anterior enquanto o job noturno grava o novo
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS universo ("
+        "ticker TEXT PRIMARY KEY, preco REAL, preco_alvo REAL, upside REAL, retorno_anos_similares REAL)"
+    )
+    # Índices ordenados para os filtros da tela (ex.: upside > 15% em setores favorecidos)
+    conn.execute("CREATE INDEX IF NOT EXISTS universo_upside ON universo (upside)")
+    conn.execute("CREATE INDEX IF NOT EXISTS universo_retorno ON universo (retorno_anos_similares)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS universo_setores ("
+        "setor TEXT NOT NULL, ticker TEXT NOT NULL, PRIMARY KEY (setor, ticker)) WITHOUT ROWID"
+    )
+    # Data do snapshot e anos similares usados no retorno histórico
+    conn.execute("CREATE TABLE IF NOT EXISTS snapshot (chave TEXT PRIMARY KEY, valor TEXT NOT NULL)")
+
+
+# Função para ler a lista de tickers do universo (subconjunto curado, ver ARQUIVO_UNIVERSO)
+@functools.lru_cache(maxsize=None)
+def carregar_universo(caminho=ARQUIVO_UNIVERSO):
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)["tickers"]
+
+
+# Função para montar o snapshot do universo com os dados de mercado buscados em lote
+def montar_snapshot(tickers, anos_similares):
+    tickers = list(dict.fromkeys(tickers))
+    cotacoes = obter_cotacoes_carteira(tickers)
+    retornos = analise_historica_carteira(tickers, anos_similares)
+    indice = indice_setores(tickers)
+    return pd.DataFrame({
+        "Ticker": tickers,
+        "Preço Atual": cotacoes["Preço Atual"].to_numpy(),
+        "Preço Alvo": cotacoes["Preço Alvo"].to_numpy(),
+        "Upside (%)": calcular_upside(cotacoes["Preço Atual"], cotacoes["Preço Alvo"]),
+        "Retorno Anos Similares (%)": retornos.reindex(tickers).to_numpy(),
+        "Setores": [indice.get(ticker, ()) for ticker in tickers],
+    }, columns=COLUNAS_SNAPSHOT)
+
+
+# Função para substituir o snapshot gravado em uma única transação
+def gravar_snapshot(snapshot, anos_similares, data=None):
+    data = data or datetime.date.today().isoformat()
+    valores = snapshot[COLUNAS_SNAPSHOT[:-1]].astype(object).where(snapshot[COLUNAS_SNAPSHOT[:-1]].notna(), None)
+    with _conectar() as conn:
+        conn.execute("DELETE FROM universo")
+        conn.execute("DELETE FROM universo_setores")
+        conn.executemany(
+            "INSERT INTO universo (ticker, preco, preco_alvo, upside, retorno_anos_similares) VALUES (?, ?, ?, ?, ?)",
+            valores.itertuples(index=False, name=None),
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO universo_setores (setor, ticker) VALUES (?, ?)",
+            [(setor, ticker) for ticker, setores in zip(snapshot["Ticker"], snapshot["Setores"]) for setor in setores],
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO snapshot (chave, valor) VALUES (?, ?)",
+            [("data", data), ("anos_similares", json.dumps([int(ano) for ano in anos_similares]))],
+        )
+    return len(snapshot)
+
+
+# Função para obter a data e os anos similares do snapshot gravado (None se não houver snapshot)
+def info_snapshot():
+    with _conectar() as conn:
+        info = dict(conn.execute("SELECT chave, valor FROM snapshot").fetchall())
+    if "data" not in info:
+        return None
+    return info["data"], json.loads(info["anos_similares"])
+
+
+# Função para filtrar o universo a partir do snapshot local, sem acessar a rede.
+# `setores=None` não filtra por setor; uma lista vazia não encontra nenhum ticker.
+@etapa
+def consultar_universo(upside_minimo=None, setores=None, retorno_minimo=None, limite=None):
+    condicoes, parametros = [], []
+    if upside_minimo is not None:
+        condicoes.append("u.upside > ?")
+        parametros.append(float(upside_minimo))
+    if retorno_minimo is not None:
+        condicoes.append("u.retorno_anos_similares > ?")
+        parametros.append(float(retorno_minimo))
+    if setores is not None:
+        setores = list(dict.fromkeys(setores))
+        condicoes.append(
+            f"u.ticker IN (SELECT ticker FROM universo_setores WHERE setor IN ({','.join('?' * len(setores))}))"
+        )
+        parametros.extend(setores)
+
+    consulta = (
+        "SELECT u.ticker, u.preco, u.preco_alvo, u.upside, u.retorno_anos_similares, "
+        "(SELECT group_concat(setor, ', ') FROM universo_setores s WHERE s.ticker = u.ticker) "
+        "FROM universo u"
+        + (" WHERE " + " AND ".join(condicoes) if condicoes else "")
+        + " ORDER BY u.upside DESC"
+        + (" LIMIT ?" if limite else "")
+    )
+    if limite:
+        parametros.append(int(limite))
+    with _conectar() as conn:
+        linhas = conn.execute(consulta, parametros).fetchall()
+    return pd.DataFrame(linhas, columns=COLUNAS_SNAPSHOT[:-1] + ["Setores"]).fillna({"Setores": ""})
+
+
+# Função para recalcular o snapshot de todos os tickers do universo (job agendado, ex.: cron noturno)
+def atualizar_snapshot(tickers=None, anos_similares=None):
+    tickers = tickers or carregar_universo()
+    if anos_similares is None:
+        anos_similares = pipeline.executar(parametros_cenario(None, None), ["anos_similares"])["anos_similares"]
+    return gravar_snapshot(montar_snapshot(tickers, anos_similares), anos_similares)
+
+
+# Atualização agendada (ex.: cron antes da abertura): python universo.py [TICKER...] [--anos 2019 2022]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recalcula o snapshot local do universo B3 usado na triagem.")
+    parser.add_argument("tickers", nargs="*", help="tickers (padrão: lista de universo.json)")
+    parser.add_argument("--anos", type=int, nargs="+", help="anos similares (padrão: calculados com os dados do BCB)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    with rastrear_execucao("universo"):
+        quantidade = atualizar_snapshot(args.tickers, args.anos)
+    print(f"Snapshot com {quantidade} tickers gravado em {time.perf_counter() - inicio:.1f}s.")